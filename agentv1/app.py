@@ -1,16 +1,14 @@
-import os, time, requests
-from flask import Flask, request, jsonify
+import os, time, asyncio, hashlib, logging, threading, requests
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, Response, current_app, request
 from flask_cors import CORS
 from dotenv import load_dotenv
-from scraper import canvas_scraper
-
-from dotenv import set_key
-from pathlib import Path
-
-import runmodel 
 
 
 load_dotenv()
+log = logging.getLogger(__name__)
 app = Flask(__name__)
 # CORS configuration for development (be more permissive for Chrome extensions)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
@@ -18,36 +16,77 @@ CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
 CANVAS_BASE = os.getenv("CANVAS_BASE_URL", "").rstrip("/")
 BACKEND_URL  = os.getenv("BACKEND_URL", "")  # Default to empty string for testing
 BACKEND_AUTH = os.getenv("BACKEND_AUTH")  # e.g., "Bearer <key>"
-env_path = Path(".env")
+# ---- HTTP sessions (keep-alive + connection pooling) ----
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Content-Type"] = "application/json"
+    return session
+_session = _make_session()  # backend calls
+def get_session() -> requests.Session:
+    """Shared session for backend calls (tests can monkeypatch this)."""
+    return _session
+# ---- Helpers: JSON responses ----
+def ojsonify(obj, status: int = 200):
+    """Like flask.jsonify, but encoded with orjson."""
+    return current_app.response_class(orjson.dumps(obj), status=status, mimetype="application/json")
 # ---- Helpers: Simple token validation ----
 def validate_tokens(canvas_tokens: dict, google_tokens: dict) -> bool:
     """Check if at least one valid token is provided"""
     canvas_valid = bool(canvas_tokens and canvas_tokens.get("access_token"))
     google_valid = bool(google_tokens and google_tokens.get("access_token"))
     return canvas_valid or google_valid
+def conversation_id(body: dict, canvas_tokens: dict, google_tokens: dict) -> str:
+    """Checkpoint thread for this request: the client's session_id, else one per user token."""
+    if body.get("session_id"):
+        return f"session:{body['session_id']}"
+    token = canvas_tokens.get("access_token") or google_tokens.get("access_token") or ""
+    return "user:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+def _prewarm_rag() -> None:
+    # Same imports /api/ask does lazily, plus every course's stores; a request that arrives
+    # mid-way waits on the import lock / per-course load lock instead of repeating the work
+    try:
+        import runmodel
+        import rag_utils
+        rag_utils.prewarm()
+    except Exception as e:
+        log.warning("RAG prewarm failed: %s", e)
+def start_rag_prewarm() -> None:
+    """Load the agent and every course's stores in the background, before the first /api/ask."""
+    threading.Thread(target=_prewarm_rag, name="rag-prewarm", daemon=True).start()
 # ---- Routes ----
 @app.get("/api/health")
 def health():
-    return jsonify({"ok": True})
+    return ojsonify({"ok": True})
 @app.post("/api/courses")
 def get_courses():
     """Get list of courses from Canvas using the provided token"""
     body = request.get_json(force=True, silent=True) or {}
     canvas_tokens = body.get("canvas_tokens", {})
-    # Debug logging
-    print(f":mag: GET COURSES REQUEST:")
-    print(f"   Canvas tokens: {bool(canvas_tokens.get('access_token'))}")
-    print(f"   Full body: {body}")
+    # Debug logging (body keys only: the values are tokens)
+    log.debug("GET COURSES REQUEST: canvas token=%s body keys=%s",
+              bool(canvas_tokens.get("access_token")), list(body))
     if not canvas_tokens.get("access_token"):
-        return jsonify({"error": "missing_canvas_token", "message": "Canvas authentication required"}), 401
+        return ojsonify({"error": "missing_canvas_token", "message": "Canvas authentication required"}, status=401)
 
     # Real mode: call Canvas API
     headers = {
         "Authorization": f"Bearer {canvas_tokens['access_token']}",
         "Content-Type": "application/json"
     }
+def _run_prompt(course_code, question: str, drive_token, thread_id: str, reset: bool = False) -> str:
+    # Imported on first use: runmodel pulls in LangChain/LangGraph/Gemini/Chroma, which
+    # /api/health and /api/courses never need (later calls hit the sys.modules cache)
+    import runmodel
+    if reset:
+        runmodel.reset_thread(thread_id)
+    runmodel.change_selected_class(course_code)
+    return runmodel.prompt(question, drive_token=drive_token, thread_id=thread_id)
 @app.post("/api/ask")
-def ask():
+async def ask():
     # 1) Read user input and tokens from request
     body = request.get_json(force=True, silent=True) or {}
     question = body.get("question", "").strip()
@@ -55,10 +94,10 @@ def ask():
     canvas_tokens = body.get("canvas_tokens", {})
     google_tokens = body.get("google_tokens", {})
     if not question:
-        return jsonify({"error":"missing_question"}), 400
+        return ojsonify({"error":"missing_question"}, status=400)
     # 2) Validate that at least one token is provided
     if not validate_tokens(canvas_tokens, google_tokens):
-        return jsonify({"error":"no_tokens_available","message":"Canvas or Google Drive authentication required"}), 401
+        return ojsonify({"error":"no_tokens_available","message":"Canvas or Google Drive authentication required"}, status=401)
     # 3) Check if we're in test mode (no backend URL configured)
     if not BACKEND_URL:
         test_response = {
@@ -79,12 +118,14 @@ def ask():
             "timestamp": int(time.time())
         }
         course_code = test_response["user_context"]
-        set_key(str(env_path), "CANVAS_ACCESS_TOKEN", test_response["tokens"]["canvas"]["available"])
-        set_key(str(env_path), "DRIVE_API_KEY", google_tokens["access_token"])
-        runmodel.change_selected_class(course_code)
-        test_response["message"] = runmodel.prompt(question)
+        # Tokens go to runmodel in memory (no .env rewrite per request); the LLM call blocks -> thread.
+        # Each user/session gets its own checkpointed conversation; "reset": true starts it over
+        test_response["message"] = await asyncio.to_thread(
+            _run_prompt, course_code, question, google_tokens.get("access_token"),
+            conversation_id(body, canvas_tokens, google_tokens), bool(body.get("reset")),
+        )
 
-        return jsonify(test_response)
+        return ojsonify(test_response)
     # 4) Build payload to your team's backend with both tokens
     outbound = {
         "question": question,
@@ -94,17 +135,26 @@ def ask():
             "google": google_tokens
         }
     }
-    headers = {"Content-Type": "application/json"}
+    headers = {}
     if BACKEND_AUTH:
         headers["Authorization"] = BACKEND_AUTH
     try:
-        resp = requests.post(BACKEND_URL, json=outbound, headers=headers, timeout=60)
+        resp = await asyncio.to_thread(get_session().post, BACKEND_URL, json=outbound, headers=headers, timeout=60, stream=True)
     except requests.RequestException as e:
-        return jsonify({"error":"backend_unreachable","details": str(e)}), 502
+        return ojsonify({"error":"backend_unreachable","details": str(e)}, status=502)
     if not resp.ok:
-        return jsonify({"error":"backend_error","status": resp.status_code, "body": resp.text}), 502
-    # 5) Pass the backend response back to the extension
-    return (resp.text, 200, {"Content-Type": "application/json"})
+        return ojsonify({"error":"backend_error","status": resp.status_code, "body": resp.text}, status=502)
+    # 5) Pass the backend response back to the extension (streamed through, never decoded here)
+    def relay():
+        try:
+            yield from resp.iter_content(8192)
+        finally:
+            resp.close()
+    return Response(relay(), status=200, mimetype="application/json")
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    # The debug reloader's parent process only watches files; the serving child prewarms
+    if os.getenv("RAG_PREWARM", "1").lower() not in ("0", "false", "no") and os.getenv("WERKZEUG_RUN_MAIN") == "true":
+        start_rag_prewarm()
     # Listen on all interfaces so other computers can connect
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
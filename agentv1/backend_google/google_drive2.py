@@ -1,19 +1,49 @@
 #!/usr/bin/env python3
 import os
+import hashlib
+import threading
+from contextvars import ContextVar
+from typing import Optional
+from cachetools import TTLCache
 from .google_drive_client import GoogleDriveClient
 
 from dotenv import load_dotenv
 load_dotenv()
 
+# Built clients keyed by sha256(token); the TTL keeps us under the ~1h access-token lifetime.
+# One cache per thread: the services sit on httplib2.Http, which isn't thread-safe, so
+# concurrent requests must never share a client (even when they all fall back to DRIVE_API_KEY)
+_local = threading.local()
+
+def _get_client(token: str) -> GoogleDriveClient:
+    clients = getattr(_local, "clients", None)
+    if clients is None:
+        clients = _local.clients = TTLCache(maxsize=64, ttl=300)
+    token_hash = hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+    client = clients.get(token_hash)
+    if client is None:
+        client = clients[token_hash] = GoogleDriveClient(access_token=token)
+    return client
+
+# Default token read once; the API layer overrides it per request (context-local, so
+# concurrent requests don't see each other's token)
+DRIVE_API_KEY = os.getenv("DRIVE_API_KEY")
+_drive_token: ContextVar[Optional[str]] = ContextVar("drive_token", default=None)
+
+def set_drive_token(token: str) -> None:
+    _drive_token.set(token)
+
+def get_drive_token() -> Optional[str]:
+    return _drive_token.get() or DRIVE_API_KEY
+
 def send_to_google_drive(content: str, title: str):
-    token = os.getenv("DRIVE_API_KEY")
+    token = get_drive_token()
 
-    client = GoogleDriveClient(access_token=token)
+    client = _get_client(token)
 
-    doc = client.create_document(title)
-    client.update_document_content(doc["id"], content)
+    # One request: Drive converts the uploaded text into the new Google Doc
+    doc = client.create_document(title, content)
     return doc["id"]
 
 def read_from_google_drive():
     pass
-
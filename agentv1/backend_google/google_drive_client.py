@@ -10,7 +10,7 @@ from typing import Optional, List, Dict, Any
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
+from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload, MediaIoBaseUpload
 
 
 # Scopes for Google Drive API
@@ -21,6 +21,24 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive'  # Full access (use with caution)
 ]
 
+# In-memory uploads: documents larger than this go through a resumable upload
+UPLOAD_CHUNK_SIZE = 1 << 20
+RESUMABLE_UPLOAD_THRESHOLD = 5 * UPLOAD_CHUNK_SIZE
+
+# Partial response for documents().get: just the text, no styles/lists/inline objects
+DOC_TEXT_FIELDS = 'body/content/paragraph/elements/textRun/content'
+
+
+def document_text(document: Dict[str, Any]) -> str:
+    """Concatenate the text runs of a Docs API document resource."""
+    return "".join(
+        run['textRun'].get('content', '')
+        for element in document.get('body', {}).get('content', [])
+        if 'paragraph' in element
+        for run in element['paragraph'].get('elements', [])
+        if 'textRun' in run
+    )
+
 
 class GoogleDriveClient:
     """Client for interacting with Google Drive API using extension tokens"""
@@ -42,9 +60,10 @@ class GoogleDriveClient:
             # Create credentials from the access token
             creds = Credentials(token=access_token)
             
-            # Build the services
-            self.service = build('drive', 'v3', credentials=creds)
-            self.docs_service = build('docs', 'v1', credentials=creds)
+            # Build the services from the discovery docs bundled with the client
+            # library (no discovery HTTP round-trip per client)
+            self.service = build('drive', 'v3', credentials=creds, static_discovery=True, cache_discovery=False)
+            self.docs_service = build('docs', 'v1', credentials=creds, static_discovery=True, cache_discovery=False)
             
         except Exception as e:
             raise Exception(f"Authentication failed: {e}")
@@ -105,17 +124,14 @@ class GoogleDriveClient:
             file_metadata['parents'] = [folder_id]
         
         try:
+            # Initial content is uploaded as text/plain in the same request; Drive converts it
+            media = self._text_media(content) if content else None
             file = self.service.files().create(
                 body=file_metadata,
+                media_body=media,
                 fields='id,name,mimeType,createdTime,modifiedTime'
             ).execute()
             
-            # Add content if provided
-            if content:
-                # For now, just create the document without content
-                # Content can be added later using Google Docs API
-                print(f"Note: Document created. Content addition requires Google Docs API.")
-            
             return file
         except HttpError as error:
             raise Exception(f"Document creation failed: {error}")
@@ -158,18 +174,26 @@ class GoogleDriveClient:
             Document content as a string.
         """
         try:
-            # Use Google Docs API to read content
-            document = self.docs_service.documents().get(documentId=file_id).execute()
-            content = ""
-            for element in document.get('body', {}).get('content', []):
-                if 'paragraph' in element:
-                    for run in element['paragraph'].get('elements', []):
-                        if 'textRun' in run:
-                            content += run['textRun']['content']
-            return content
+            # Use Google Docs API to read content (fields mask: only the text runs come back)
+            document = self.docs_service.documents().get(
+                documentId=file_id,
+                fields=DOC_TEXT_FIELDS
+            ).execute()
+            return document_text(document)
         except HttpError as error:
             raise Exception(f"Document read failed: {error}")
 
+    @staticmethod
+    def _text_media(content: str) -> MediaIoBaseUpload:
+        """In-memory text/plain upload body (resumable for large documents)."""
+        data = content.encode('utf-8')
+        return MediaIoBaseUpload(
+            io.BytesIO(data),
+            mimetype='text/plain',
+            chunksize=UPLOAD_CHUNK_SIZE,
+            resumable=len(data) > RESUMABLE_UPLOAD_THRESHOLD,
+        )
+
     def update_document_content(self, file_id: str, content: str) -> bool:
         """
         Update content of a Google Docs document
@@ -182,25 +206,14 @@ class GoogleDriveClient:
             True if successful
         """
         try:
-            # Create a temporary file with the content
-            import tempfile
-            import os
-            
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as temp_file:
-                temp_file.write(content)
-                temp_file_path = temp_file.name
-            
-            # Upload the content using the file path
-            media = MediaFileUpload(temp_file_path, mimetype='text/plain')
+            # Upload straight from memory (no temp file round-trip)
+            media = self._text_media(content)
             
             self.service.files().update(
                 fileId=file_id,
                 media_body=media
             ).execute()
             
-            # Clean up temp file
-            os.unlink(temp_file_path)
-            
             return True
         except HttpError as error:
             raise Exception(f"Document update failed: {error}")
@@ -0,0 +1,168 @@
+# bm25_index.py
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ---------- Incremental BM25 ----------
+class IncrementalBM25:
+    """
+    Okapi BM25 with the same scoring as rank_bm25.BM25Okapi, but appendable.
+
+    Term frequencies live in flat COO arrays (doc_ids, term_ids, tfs). Adding documents only
+    appends rows and bumps df / doc_len; IDF and avgdl are derived from those stats on demand,
+    so the old corpus is never re-scanned.
+
+    For querying, the pairs are regrouped by term (CSC-style postings) with each pair's BM25
+    term weight precomputed, so a query only touches the postings of its own terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocab: Dict[str, int] = {}
+        self.df       = np.zeros(0, dtype=np.int64)  # per term: number of docs containing it
+        self.doc_len  = np.zeros(0, dtype=np.int64)  # per doc: number of tokens
+        self.doc_ids  = np.zeros(0, dtype=np.int64)  # per (doc, term) pair
+        self.term_ids = np.zeros(0, dtype=np.int64)
+        self.tfs      = np.zeros(0, dtype=np.int64)
+        self._idf: Optional[np.ndarray] = None
+        self._postings: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    @property
+    def corpus_size(self) -> int:
+        return len(self.doc_len)
+
+    def add_documents(self, corpus: List[List[str]]) -> None:
+        base = self.corpus_size
+        doc_ids: List[int] = []
+        term_ids: List[int] = []
+        tfs: List[int] = []
+        lens: List[int] = []
+        for offset, doc in enumerate(corpus):
+            counts: Dict[int, int] = {}
+            for tok in doc:
+                tid = self.vocab.setdefault(tok, len(self.vocab))
+                counts[tid] = counts.get(tid, 0) + 1
+            doc_ids.extend([base + offset] * len(counts))
+            term_ids.extend(counts.keys())
+            tfs.extend(counts.values())
+            lens.append(len(doc))
+
+        new_terms = np.asarray(term_ids, dtype=np.int64)
+        df = np.zeros(len(self.vocab), dtype=np.int64)
+        df[:len(self.df)] = self.df
+        self.df = df + np.bincount(new_terms, minlength=len(self.vocab))
+        self.doc_len  = np.concatenate([self.doc_len, np.asarray(lens, dtype=np.int64)])
+        self.doc_ids  = np.concatenate([self.doc_ids, np.asarray(doc_ids, dtype=np.int64)])
+        self.term_ids = np.concatenate([self.term_ids, new_terms])
+        self.tfs      = np.concatenate([self.tfs, np.asarray(tfs, dtype=np.int64)])
+        self._idf = None
+        self._postings = None
+
+    @property
+    def idf(self) -> np.ndarray:
+        if self._idf is None:
+            n = self.corpus_size
+            idf = np.log(n - self.df + 0.5) - np.log(self.df + 0.5)
+            # BM25Okapi floors negative IDFs (very common terms) at epsilon * mean IDF
+            eps = self.epsilon * idf.mean() if idf.size else 0.0
+            self._idf = np.where(idf < 0, eps, idf)
+        return self._idf
+
+    def postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(term offsets, doc ids, weights): term t's postings are [offsets[t], offsets[t+1])."""
+        if self._postings is None:
+            order = np.argsort(self.term_ids, kind="stable")
+            docs  = self.doc_ids[order]
+            tf    = self.tfs[order].astype(float)
+            avgdl = self.doc_len.sum() / self.corpus_size
+            norm  = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / avgdl)
+            offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.term_ids, minlength=len(self.vocab)), out=offsets[1:])
+            self._postings = (offsets, docs, tf * (self.k1 + 1) / (tf + norm))
+        return self._postings
+
+    def sparse_scores(self, query: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc ids, scores) of the documents sharing a term with the query; every other doc scores 0."""
+        qids = [self.vocab[q] for q in query if q in self.vocab]
+        if not qids or self.corpus_size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        qids, qcounts = np.unique(np.asarray(qids, dtype=np.int64), return_counts=True)
+
+        offsets, docs, weights = self.postings()
+        idf = self.idf
+        spans = [slice(offsets[t], offsets[t + 1]) for t in qids]
+        d = np.concatenate([docs[sl] for sl in spans])
+        w = np.concatenate([weights[sl] * (idf[t] * c) for sl, t, c in zip(spans, qids, qcounts)])
+        ids, inverse = np.unique(d, return_inverse=True)
+        return ids, np.bincount(inverse, weights=w)
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        scores = np.zeros(self.corpus_size)
+        ids, sparse = self.sparse_scores(query)
+        scores[ids] = sparse
+        return scores
+
+    # ---------- Persistence ----------
+    def arrays(self) -> Dict[str, np.ndarray]:
+        # Stored as uint32 token/doc ids and counts: half the size of int64 on disk.
+        # The (doc, term) pairs are written in term order, so postings() on a freshly
+        # loaded index sorts presorted input (linear) instead of shuffled pairs.
+        order = np.argsort(self.term_ids, kind="stable")
+        return {
+            "df": self.df.astype(np.uint32, copy=False),
+            "doc_len": self.doc_len.astype(np.uint32, copy=False),
+            "doc_ids": self.doc_ids[order].astype(np.uint32, copy=False),
+            "term_ids": self.term_ids[order].astype(np.uint32, copy=False),
+            "tfs": self.tfs[order].astype(np.uint32, copy=False),
+        }
+
+    def params(self) -> Dict[str, Any]:
+        return {"k1": self.k1, "b": self.b, "epsilon": self.epsilon}
+
+    @classmethod
+    def from_saved(cls, arrays, params: Dict[str, Any], vocab: List[str]) -> "IncrementalBM25":
+        bm25 = cls(**params)
+        bm25.vocab = {tok: i for i, tok in enumerate(vocab)}
+        # Kept as uint32 (no widening copy); appended int64 rows upcast on concatenate
+        for name in ("df", "doc_len", "doc_ids", "term_ids", "tfs"):
+            setattr(bm25, name, arrays[name])
+        return bm25
+
+    @classmethod
+    def from_legacy_pickle(cls, payload: Dict[str, Any]) -> "IncrementalBM25":
+        """Rebuild from the old {slug}_bm25.pkl payload (a rank_bm25.BM25Okapi + its tokenized corpus)."""
+        bm25 = cls()
+        bm25.add_documents(payload["tokens"] if "tokens" in payload else payload["bm25"].corpus)
+        return bm25
+
+
+# ---------- Files: {slug}_bm25.npz (arrays) + {slug}_bm25.json (vocab, chunks, metas) ----------
+# chunks is None when the chunk text already lives in the course's Chroma collection
+def bm25_paths(db_dir: Path, course_slug: str) -> Tuple[Path, Path]:
+    return db_dir / f"{course_slug}_bm25.npz", db_dir / f"{course_slug}_bm25.json"
+
+def save_bm25_pkg(db_dir: Path, course_slug: str, bm25: IncrementalBM25,
+                  chunks: Optional[List[str]], metas: List[Dict[str, Any]]) -> Path:
+    npz_path, json_path = bm25_paths(db_dir, course_slug)
+    np.savez(npz_path, **bm25.arrays())
+    vocab = sorted(bm25.vocab, key=bm25.vocab.__getitem__)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"params": bm25.params(), "vocab": vocab, "chunks": chunks, "metas": metas}, f, ensure_ascii=False)
+    return npz_path
+
+def load_bm25_files(db_dir: Path, course_slug: str) -> Optional[Dict[str, Any]]:
+    """Returns {bm25, chunks, metas} or None if the course has no saved index."""
+    npz_path, json_path = bm25_paths(db_dir, course_slug)
+    if not (npz_path.exists() and json_path.exists()):
+        return None
+    with open(json_path, "r", encoding="utf-8") as f:
+        side = json.load(f)
+    with np.load(npz_path) as arrays:
+        bm25 = IncrementalBM25.from_saved(arrays, side["params"], side["vocab"])
+    return {"bm25": bm25, "chunks": side.get("chunks"), "metas": side["metas"]}
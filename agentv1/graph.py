@@ -1,33 +1,26 @@
-import os
-from dotenv import load_dotenv
+import logging
+import sqlite3
+import contextvars
+from pathlib import Path
 from typing import Annotated,Sequence, TypedDict
 
-import json
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages # helper function to add messages to the state
 
 from langchain_core.messages import AIMessage, ToolMessage
-
-from langchain_core.tools import tool
-from geopy.geocoders import Nominatim
-from pydantic import BaseModel, Field
-import requests
-
-from datetime import datetime
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-from langchain_core.messages import ToolMessage
 from langchain_core.runnables import RunnableConfig
 
 from langgraph.graph import StateGraph, END
 
-from IPython.display import Image, display
-
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
 
 from tools import tools
-from model import model
+from model import batched_model_for, tools_for_config, with_prompt_prefix
+
+log = logging.getLogger(__name__)
 
 class AgentState(TypedDict):
     """The state of the agent."""
@@ -49,21 +42,34 @@ def should_continue(state: AgentState):
 tools_by_name = {tool.name: tool for tool in tools}
 
 
+_tool_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tool")
+
+def _tool_content(result) -> str:
+    # Make sure content is a string (skip the JSON round-trip when it already is one)
+    if isinstance(result, str):
+        return result
+    if isinstance(result, bytes):
+        return result.decode("utf-8", "replace")
+    return orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS).decode()
+
+def _run_tool_call(tool_call) -> ToolMessage:
+    result = tools_by_name[tool_call["name"]].invoke(tool_call["args"])
+    return ToolMessage(
+        content=_tool_content(result),
+        name=tool_call["name"],
+        tool_call_id=tool_call["id"],
+    )
+
 def call_tool(state: AgentState):
-    outputs = []
     last = state["messages"][-1]
-    for tool_call in last.tool_calls:
-        result = tools_by_name[tool_call["name"]].invoke(tool_call["args"])
-        # Make sure content is a string
-        if not isinstance(result, str):
-            result = json.dumps(result, ensure_ascii=False)
-        outputs.append(
-            ToolMessage(
-                content=result,
-                name=tool_call["name"],
-                tool_call_id=tool_call["id"],
-            )
-        )
+    tool_calls = last.tool_calls
+    if len(tool_calls) == 1:
+        outputs = [_run_tool_call(tool_calls[0])]
+    else:
+        # Tool calls in one turn are independent (e.g. database + Drive) -> run them side by side
+        # (each call gets a copy of the caller's context, e.g. the request's Drive token)
+        futures = [_tool_pool.submit(contextvars.copy_context().run, _run_tool_call, tc) for tc in tool_calls]
+        outputs = [f.result() for f in futures]
     return {"messages": outputs}
 
 def call_model(
@@ -76,11 +82,15 @@ def call_model(
     
     # Invoke the model with the system prompt and the messages
     # in call_model, just before invoke:
-    print("[DEBUG] sending", len(state["messages"]), "messages to LLM:")
-    for i, m in enumerate(state["messages"]):
-        print(f"  {i}: {m.type} :: {getattr(m, 'content', '')[:80]!r}")
-
-    response = model.invoke(state["messages"], config)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("sending %d messages to LLM:", len(state["messages"]))
+        for i, m in enumerate(state["messages"]):
+            log.debug("  %d: %s :: %r", i, m.type, getattr(m, "content", "")[:80])
+
+    tool_names = tools_for_config(config)
+    # Prefix first: it may refresh the prompt cache, which swaps the model batched_model_for returns
+    messages = with_prompt_prefix(state["messages"], tool_names)
+    response = batched_model_for(tool_names).invoke(messages, config)
     # We return a list, because this will get added to the existing messages state using the add_messages reducer
     return {"messages": [response]}
 
@@ -111,7 +121,9 @@ workflow.add_conditional_edges(
 # 4. Add a normal edge after `tools` is called, `llm` node is called next.
 workflow.add_edge("tools", "llm")
 
-# Now we can compile and visualize our graph
+# Now we can compile our graph
 
-checkpointer = MemorySaver()
-graph = workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
+# Conversation checkpoints live in SQLite so threads survive process restarts / the debug reloader
+CHECKPOINT_DB_PATH = Path(__file__).resolve().parent / "checkpoints.sqlite"
+checkpointer = SqliteSaver(sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False))
+graph = workflow.compile(checkpointer=checkpointer)
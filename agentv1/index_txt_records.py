@@ -4,36 +4,45 @@ from __future__ import annotations
 import os
 import re
 import pickle
+import asyncio
+import sqlite3
 import hashlib
 from dataclasses import dataclass
 from collections import defaultdict
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple, Dict, Any
 
 from dotenv import load_dotenv
 load_dotenv()
 
+import numpy as np
+
 import ast
 from typing import List, Tuple
 
 from langchain.schema import Document
 from langchain_chroma import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from rank_bm25 import BM25Okapi
+from bm25_index import IncrementalBM25, save_bm25_pkg, load_bm25_files
+from blake3 import blake3
 
-from rag_utils import hybrid_search, format_chunk
+from rag_utils import HNSW_CONFIG, hybrid_search, format_chunk, invalidate_course_cache, mark_collection_indexed
 
 # ---------- Config ----------
 BASE_DIR = Path(__file__).resolve().parent
 CHROMA_DB_PATH = (BASE_DIR / "chroma_db").as_posix()   # per-course folders live here
-BM25_DB_PATH   = (BASE_DIR / "bm25_db")                # per-course bm25 pickles
+BM25_DB_PATH   = (BASE_DIR / "bm25_db")                # per-course bm25 indexes (.npz + .json)
 BM25_DB_PATH.mkdir(parents=True, exist_ok=True)
 
 GEMINI_EMBED_MODEL = "models/text-embedding-004"
 TOKEN_PATTERN  = re.compile(r"\w+")
+SLUG_PATTERN   = re.compile(r"[^a-z0-9]+")
 CHUNK_SIZE     = 1000
 CHUNK_OVERLAP  = 200
+EMBED_BATCH_SIZE = 100  # max texts per Gemini embed request
 STORE_TEXT_IN_CHROMA = True  # if False, we add only vectors + metadata
+EMBED_CACHE_PATH = Path(CHROMA_DB_PATH) / "_embed_cache.sqlite"  # content hash -> vector
 
 API_KEY = os.getenv("GOOGLE_API_KEY")
 if not API_KEY:
@@ -50,8 +59,7 @@ class TxtRecord:
 
 # ---------- Utils ----------
 def slug(s: str) -> str:
-    import re as _re
-    return _re.sub(r"[^a-z0-9]+", "_", s.lower()).strip("_")
+    return SLUG_PATTERN.sub("_", s.lower()).strip("_")
 
 def build_header(r: TxtRecord) -> str:
     return (
@@ -62,17 +70,44 @@ def build_header(r: TxtRecord) -> str:
         f"Path: {r.file_path}\n\n"
     )
 
-def read_text(path: str) -> str:
+def resolve_path(path: str) -> Path:
     p = Path(path)
     if not p.is_absolute():
         p = (BASE_DIR / p).resolve()
     if not p.exists():
         raise FileNotFoundError(f"File not found: {p}")
-    return p.read_text(encoding="utf-8", errors="ignore")
+    return p
+
+def read_text(path: str) -> str:
+    return resolve_path(path).read_text(encoding="utf-8", errors="ignore")
 
 def content_hash(text: str) -> str:
+    # Dedup fingerprint for source_key, not a security boundary -> fast BLAKE3
+    return blake3(text.encode("utf-8", errors="ignore")).hexdigest(length=16)
+
+def legacy_content_hash(text: str) -> str:
+    # SHA-256 digest that source_keys were built from before the switch to BLAKE3
     return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
 
+HASH_READ_SIZE = 1 << 20  # 1 MiB
+
+def hash_file(path: str) -> str:
+    """Stream the file through BLAKE3 without holding it (or a decoded copy) in memory."""
+    h = blake3()
+    with open(resolve_path(path), "rb") as f:
+        while chunk := f.read(HASH_READ_SIZE):
+            h.update(chunk)
+    return h.hexdigest(length=16)
+
+@lru_cache(maxsize=4096)
+def _file_content_hash(path: str, mtime_ns: int, size: int) -> str:
+    return hash_file(path)
+
+def file_content_hash(path: str) -> str:
+    """content_hash of a file on disk, memoized on (path, mtime, size) so unchanged files aren't re-hashed."""
+    st = resolve_path(path).stat()
+    return _file_content_hash(path, st.st_mtime_ns, st.st_size)
+
 def collection_count_safe(vector_store: Chroma) -> int:
     try:
         return vector_store._collection.count()  # type: ignore[attr-defined]
@@ -96,20 +131,100 @@ def chunk_text_fixed(text: str, size: int, overlap: int) -> List[str]:
     assert 0 <= overlap < size, "overlap must be in [0, size)"
     step = size - overlap
     n = len(text)
-    chunks: List[str] = []
-    i = 0
-    while i < n:
-        end = min(i + size, n)
-        chunks.append(text[i:end])
-        if end == n: break
-        i += step
-    return chunks
+    if n == 0:
+        return []
+    # chunk boundaries computed up front; the last chunk is the first one reaching the end
+    n_chunks = 1 if n <= size else -(-(n - size) // step) + 1
+    starts = np.arange(n_chunks) * step
+    ends = np.minimum(starts + size, n)
+    return [text[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+def chunk_body(text: str) -> List[str]:
+    return chunk_text_fixed(text, CHUNK_SIZE, CHUNK_OVERLAP)
+
+def embed_in_batches(embeddings, texts: List[str]) -> List[List[float]]:
+    vectors: List[List[float]] = []
+    for i in range(0, len(texts), EMBED_BATCH_SIZE):
+        vectors.extend(embeddings.embed_documents(texts[i:i + EMBED_BATCH_SIZE]))
+    return vectors
+
+# ---------- Embedding cache (singleton) ----------
+_embed_cache = None
+def get_embed_cache() -> sqlite3.Connection:
+    global _embed_cache
+    if _embed_cache is None:
+        EMBED_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _embed_cache = sqlite3.connect(EMBED_CACHE_PATH)
+        _embed_cache.execute("PRAGMA journal_mode=WAL")
+        _embed_cache.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key TEXT NOT NULL, vec BLOB NOT NULL, PRIMARY KEY (model, key))"
+        )
+    return _embed_cache
+
+def embed_with_cache(embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    embed_documents with a content-addressed cache: identical chunk texts (within this run
+    or from earlier runs) are only sent to the embedding API once.
+    """
+    db = get_embed_cache()
+    keys = [content_hash(t) for t in texts]
+    unique_keys = list(dict.fromkeys(keys))
+
+    vectors: Dict[str, List[float]] = {}
+    for i in range(0, len(unique_keys), 500):  # stay under SQLite's bound-parameter limit
+        batch = unique_keys[i:i + 500]
+        rows = db.execute(
+            f"SELECT key, vec FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+            [GEMINI_EMBED_MODEL, *batch],
+        )
+        vectors.update((k, np.frombuffer(v, dtype=np.float32).tolist()) for k, v in rows)
+
+    misses: Dict[str, str] = {}
+    for k, t in zip(keys, texts):
+        if k not in vectors:
+            misses.setdefault(k, t)
+    if misses:
+        new_vectors = dict(zip(misses, embed_in_batches(embeddings, list(misses.values()))))
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vec) VALUES (?, ?, ?)",
+                [(GEMINI_EMBED_MODEL, k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in new_vectors.items()],
+            )
+        vectors.update(new_vectors)
+
+    print(f"[embed] {len(texts)} chunks: {len(unique_keys) - len(misses)} cached, {len(misses)} embedded")
+    return [vectors[k] for k in keys]
+
+async def prepare_records(records: List[TxtRecord], existing_keys: set) -> List[Tuple[TxtRecord, str, int, List[str] | None]]:
+    """
+    Hash every record first (threads, disk I/O); only records whose source_key is new are
+    read (threads) and chunked. All records run concurrently.
+    Returns (record, source_key, body_len, body_chunks) in input order; body_chunks is None
+    for records that are already indexed.
+    """
+    async def _prepare(r: TxtRecord):
+        digest = await asyncio.to_thread(file_content_hash, r.file_path)
+        source_key = f"{r.file_path}|{r.date}|{digest}"
+        if source_key in existing_keys:
+            return r, source_key, 0, None
+        raw_text = await asyncio.to_thread(read_text, r.file_path)
+        if existing_keys and f"{r.file_path}|{r.date}|{legacy_content_hash(raw_text)}" in existing_keys:
+            return r, source_key, 0, None  # indexed under its old SHA-256 key
+        # Plain str slicing: cheaper in-process than shipping the text to a worker and back
+        body_chunks = chunk_body(raw_text)
+        return r, source_key, len(raw_text), body_chunks
+
+    return await asyncio.gather(*(_prepare(r) for r in records))
 
 # ---------- Indexing ----------
 def index_course(records: List[TxtRecord]) -> None:
     """
     Index all TXT records for a single course into its own Chroma collection
-    and update a per-course BM25 pickle.
+    and update a per-course BM25 index.
     """
     if not records:
         return
@@ -119,13 +234,13 @@ def index_course(records: List[TxtRecord]) -> None:
     print(f"\n--- Processing course: {course} ---")
 
     collection_path = f"{CHROMA_DB_PATH}/{course_slug}_collection"
-    bm25_file = BM25_DB_PATH / f"{course_slug}_bm25.pkl"
+    legacy_bm25_file = BM25_DB_PATH / f"{course_slug}_bm25.pkl"
 
     embeddings = GoogleGenerativeAIEmbeddings(model=GEMINI_EMBED_MODEL, google_api_key=API_KEY)
 
     # Load/attach existing collection (for dedupe + append)
     if Path(collection_path).exists() and any(Path(collection_path).iterdir()):
-        vector_store = Chroma(persist_directory=collection_path, embedding_function=embeddings)
+        vector_store = Chroma(persist_directory=collection_path, embedding_function=embeddings, collection_metadata=HNSW_CONFIG)
         existing_meta = vector_store.get(include=["metadatas"]).get("metadatas", [])
         existing_keys = {m.get("source_key", "") for m in existing_meta if isinstance(m, dict)}
         print(f"Found existing collection with {len(existing_keys)} sources.")
@@ -136,13 +251,10 @@ def index_course(records: List[TxtRecord]) -> None:
 
     new_chunks: List[Document] = []
 
-    for r in records:
-        raw_text = read_text(r.file_path)
-        print(f"[index] {r.file_name} body_len={len(raw_text)}")
-
-        source_key = f"{r.file_path}|{r.date}|{content_hash(raw_text)}"
-        if source_key in existing_keys:
-            continue
+    for r, source_key, body_len, body_chunks in asyncio.run(prepare_records(records, existing_keys)):
+        if body_chunks is None:
+            continue  # already indexed, never read from disk
+        print(f"[index] {r.file_name} body_len={body_len}")
 
         base_meta = {
             "course": r.course,
@@ -153,9 +265,7 @@ def index_course(records: List[TxtRecord]) -> None:
             "source_key": source_key,
         }
 
-        # Fixed-size chunking of BODY ONLY
-        body_chunks = chunk_text_fixed(raw_text, CHUNK_SIZE, CHUNK_OVERLAP)
-
+        # body_chunks: fixed-size chunking of BODY ONLY (done in prepare_records)
         # Prepend header to EVERY chunk
         header = build_header(r)
         hdr_len = len(header)
@@ -179,51 +289,59 @@ def index_course(records: List[TxtRecord]) -> None:
     for i, c in enumerate(new_chunks, start=start_id):
         c.metadata["chunk_id"] = i
 
-    # Append to Chroma
-    if STORE_TEXT_IN_CHROMA:
-        if vector_store:
-            vector_store.add_documents(new_chunks)
-        else:
-            vector_store = Chroma.from_documents(new_chunks, embedding=embeddings, persist_directory=collection_path)
-    else:
-        texts = [c.page_content for c in new_chunks]
-        ids   = [str(c.metadata["chunk_id"]) for c in new_chunks]
-        metas = [c.metadata for c in new_chunks]
-        embs  = embeddings.embed_documents(texts)
-        if vector_store:
-            vector_store.add(ids=ids, embeddings=embs, metadatas=metas)
-        else:
-            vector_store = Chroma(persist_directory=collection_path, embedding_function=embeddings)
-            vector_store.add(ids=ids, embeddings=embs, metadatas=metas)
+    # Append to Chroma with precomputed (cached) vectors
+    texts = [c.page_content for c in new_chunks]
+    ids   = [str(c.metadata["chunk_id"]) for c in new_chunks]
+    metas = [c.metadata for c in new_chunks]
+    embs  = embed_with_cache(embeddings, texts)
+    if vector_store is None:
+        vector_store = Chroma(persist_directory=collection_path, embedding_function=embeddings, collection_metadata=HNSW_CONFIG)
+    # One add() per batch: Chroma rejects adds larger than the client's max batch size
+    step = vector_store._client.get_max_batch_size()  # type: ignore[attr-defined]
+    for i in range(0, len(ids), step):
+        vector_store._collection.add(  # type: ignore[attr-defined]
+            ids=ids[i:i + step],
+            embeddings=embs[i:i + step],
+            metadatas=metas[i:i + step],
+            documents=texts[i:i + step] if STORE_TEXT_IN_CHROMA else None,
+        )
 
+    mark_collection_indexed(Path(collection_path))  # query processes reopen the collection
     print(f"   ✅  Vector store updated ({len(new_chunks)} chunks added)")
 
     # Update BM25 (header included in each chunk)
-    toks_new = [TOKEN_PATTERN.findall(c.page_content.lower()) for c in new_chunks]
-
-    if bm25_file.exists():
-        with open(bm25_file, "rb") as f:
+    # One \w+ findall per chunk: cheaper in-process than pickling the text to a worker and back
+    toks_new = [tokenize(c.page_content) for c in new_chunks]
+
+    # Chunk text is only kept in the BM25 sidecar when Chroma doesn't already store it
+    keep_chunks = not STORE_TEXT_IN_CHROMA
+
+    pkg = load_bm25_files(BM25_DB_PATH, course_slug)
+    if pkg is not None:
+        bm25, all_chunks, all_metas = pkg["bm25"], pkg["chunks"] or [], pkg["metas"]
+    elif legacy_bm25_file.exists():
+        # One-time migration from the old BM25Okapi pickle
+        with open(legacy_bm25_file, "rb") as f:
             payload = pickle.load(f)
-        old_tokens = payload["tokens"] if "tokens" in payload else payload["bm25"].corpus
-        old_chunks = payload["chunks"]
-        old_metas  = payload["metas"]
+        bm25 = IncrementalBM25.from_legacy_pickle(payload)
+        all_chunks, all_metas = payload["chunks"], payload["metas"]
     else:
-        old_tokens, old_chunks, old_metas = [], [], []
+        bm25, all_chunks, all_metas = IncrementalBM25(), [], []
 
-    all_tokens = old_tokens + toks_new
-    all_chunks = old_chunks + [c.page_content for c in new_chunks]
-    all_metas  = old_metas  + [c.metadata for c in new_chunks]
+    # Append only the new chunks; IDF/avgdl are derived from the stored stats on query
+    bm25.add_documents(toks_new)
+    all_chunks = all_chunks + [c.page_content for c in new_chunks] if keep_chunks else None
+    all_metas  = all_metas  + [c.metadata for c in new_chunks]
 
-    bm25 = BM25Okapi(all_tokens)
-    with open(bm25_file, "wb") as f:
-        pickle.dump({"bm25": bm25, "tokens": all_tokens, "chunks": all_chunks, "metas": all_metas}, f)
-    print(f"   ✅  BM25 pickle updated → {bm25_file}")
+    bm25_file = save_bm25_pkg(BM25_DB_PATH, course_slug, bm25, all_chunks, all_metas)
+    print(f"   ✅  BM25 index updated → {bm25_file}")
+    invalidate_course_cache(course)
 
 # ---------- Batch API ----------
 def index_all_txt_records(records: List[Tuple[str, str, str, str, str]]) -> None:
     """
     records: list of tuples (file_name, date, course, module, file_path)
-    Groups by course and indexes into separate Chroma collections + BM25 pickles.
+    Groups by course and indexes into separate Chroma collections + BM25 indexes.
     """
     by_course: Dict[str, List[TxtRecord]] = defaultdict(list)
     for (file_name, date, course, module, file_path) in records:
@@ -1,20 +1,212 @@
 import os
+import time
+import logging
+import datetime
+import queue
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
 from dotenv import load_dotenv
 
+from langchain_core.messages import SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from tools import tools
 
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
+log = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-2.0-flash"
+# Micro-batching window for concurrent model calls, in seconds. Off by default: turns run
+# one at a time, so waiting only adds latency (and a batched call can't stream tokens)
+LLM_BATCH_WAIT = float(os.getenv("LLM_BATCH_WAIT", "0"))
+PROMPT_CACHE_TTL = datetime.timedelta(hours=1)
+# Opt-in: creating the cache is a network call at import, and Gemini rejects prefixes below
+# its minimum cached size (the current prompt + tools is well under it)
+USE_PROMPT_CACHE = os.getenv("GEMINI_PROMPT_CACHE", "").lower() in ("1", "true", "yes")
+
+# Stable prompt prefix: identical on every turn, so the provider can serve it from its cache
+SYSTEM_PROMPT = """
+            You are a helpful AI assistant for helping students with their classes. As an AI, you should try your hardest to help your student succeed. You should ask follow-up questions if the student's prompt is not clear. You will be referred to as AI in instructions. The student has already declared which classes they want to create content for. You will be able to see the content after you make tool calls. 
+            The AI has access to seven tools. get_information_from_database, get_information_from_database_batch, create_note_sheet, answer_question, get_entire_lecture_notes, get_lecture_notes_range, get_current_date. 
+            Two of these tools: create_note_sheet, answer_question are direct returning tools, which means that they are the last thing the AI will do. The AI will use the other five tools to help you gather information for these tools. The AI should call create_note_sheet OR answer_question but never both.
+            Using the create_note_sheet tool will allow the AI to push a note sheet to the students' google drive. The AI will need to gather information before doing this. The AI should not create a note sheet unless specifically asked.You should format for a google doc sheet. Markdown will not compile correctly, so do not try to add bold using '*'.
+            Using the answer_question tool will push a text response to the user. It will not generate a note sheet but it useful for answering questions that the user asks. The AI will also need to gather information to be able to do this. 
+            The tool get_information_from_database is used to access the students' information repository. The AI will almost ALWAYS need to call it, unless the AI is asked a question that doesn't require gathering more information, such as 'can you reformat your response'. The database call returns information on the lecture date, name, course, module, path, and a relevant part of the lecture. It is important for the AI to understand how the query works, because the AI can make the query more effective if it modifies the user's query to be more specific. The database will look at important keywords to query similar information. So a query ‘how does the quadratic formula work’, is better queried as ‘quadratic formula worked examples practice problems step-by-step solutions since it uses better keywords. 
+            The tool get_information_from_database_batch works like get_information_from_database but takes a list of queries and returns one result list per query. When the AI needs several different searches (for example one per topic of a note sheet), it should make one batch call instead of several get_information_from_database calls.
+            The tool get_current_date is used to access the current date. This is important for the AI because it will need it to understand which lectures are closest to the current date. It will allow the AI to answer questions like 'load my lectures for tomorrow', since querying the database with just a date will load lecture information from those dates. You only need to call this tool if you are given a question that depends on time.
+            The tool get_entire_lecture_notes is used to access a file on the student's computer that contains the entire lecture file. If the AI calls this tool with the correct path, then it will be given the entire lecture. It is important to make sure that the AI contains the correct path before calling this function. The AI can only get path information from the get_information_from_database. 
+            The tool get_lecture_notes_range reads only part of a lecture file: the characters from start to end, plus the lecture's total length. For a long lecture where the AI only needs one section, it can read a window (for example the first 5000 characters) instead of calling get_entire_lecture_notes.
+            Examples:
+            User query: 'give me information on the quadratic formula'. The AI calls the tool get_information_from_database with the rephrased query then answer_question
+            User query: 'give me information on my lecture tomorrow'. The AI checks the current date with get_current_date and reformats the query to look for lectures tomorrow and calls get_information_from_database. Then the AI gets the path for lectures tomorrow and calls the get_entire_lecture_notes tool. The AI then either calls answer_question or create_note_sheet depending on what the user asked.
+            Remember, you are the AI. You are an assistant to help students succeed. You should be detailed in your response and try your hardest to help your students. You are able to ask follow-up questions but do not be excessive, as an AI, you sometimes must make assumptions. 
+           """
 
 llm = ChatGoogleGenerativeAI(
-    model= "gemini-2.0-flash",
+    model= MODEL_NAME,
     temperature=0.3,
     max_retries=2,
     google_api_key=api_key,
 )
 
-# bind tools to the model, tools = [get_text_response, create_note_sheet]
-model = llm.bind_tools([tools[0], tools[1], tools[2], tools[3], tools[4]])
 
+def _create_prompt_cache():
+    """
+    Upload system prompt + tool schemas once as a Gemini CachedContent (Context Caching API).
+    Returns None if the SDK or the model doesn't support it (e.g. prefix below the minimum size).
+    """
+    try:
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        genai.configure(api_key=api_key)
+        declarations = [convert_to_openai_tool(t)["function"] for t in tools]
+        return caching.CachedContent.create(
+            model=f"models/{MODEL_NAME}",
+            system_instruction=SYSTEM_PROMPT,
+            tools=[{"function_declarations": declarations}],
+            ttl=PROMPT_CACHE_TTL,
+        )
+    except Exception as e:
+        log.warning("prompt cache unavailable, sending prefix inline: %s", e)
+        return None
+
+
+_prompt_cache = _create_prompt_cache() if USE_PROMPT_CACHE else None
+
+ALL_TOOL_NAMES = frozenset(t.name for t in tools)
+# Tools that write to the student's Drive: only bound when the request carries a Google token
+GOOGLE_TOOL_NAMES = frozenset({"create_note_sheet"})
+
+
+def uses_prompt_cache(tool_names: frozenset) -> bool:
+    # The cached content was created with every tool, so it only serves the full set
+    return _prompt_cache is not None and tool_names == ALL_TOOL_NAMES
+
+
+@lru_cache(maxsize=16)
+def build_model(tool_names: frozenset):
+    """Chat model with only `tool_names` bound; every bound schema is paid for on each turn."""
+    if uses_prompt_cache(tool_names):
+        # System prompt and tools live in the cache; the request only carries the conversation
+        return ChatGoogleGenerativeAI(
+            model= MODEL_NAME,
+            temperature=0.3,
+            max_retries=2,
+            google_api_key=api_key,
+            cached_content=_prompt_cache.name,
+        )
+    return llm.bind_tools([t for t in tools if t.name in tool_names])
+
+
+def tools_for_config(config) -> frozenset:
+    """Smallest tool set usable in this run, based on which tokens the caller provided."""
+    configurable = (config or {}).get("configurable", {})
+    names = ALL_TOOL_NAMES
+    if not configurable.get("has_google_token"):
+        names -= GOOGLE_TOOL_NAMES
+    return names
+
+
+model = build_model(ALL_TOOL_NAMES)
+
+
+def with_prompt_prefix(messages, tool_names: frozenset = ALL_TOOL_NAMES):
+    """Put the cacheable system prefix in front of the conversation (or keep the cache alive)."""
+    messages = [m for m in messages if m.type != "system"]
+    if uses_prompt_cache(tool_names):
+        expires_in = _prompt_cache.expire_time - datetime.datetime.now(datetime.timezone.utc)
+        if expires_in < PROMPT_CACHE_TTL / 4:
+            _refresh_prompt_cache()
+        if uses_prompt_cache(tool_names):
+            return messages
+    prefix = [SystemMessage(content=SYSTEM_PROMPT)]
+    missing = ALL_TOOL_NAMES - tool_names
+    if missing:
+        # Kept out of SYSTEM_PROMPT so the shared prefix stays identical across turns
+        prefix.append(SystemMessage(content=f"These tools are unavailable in this session: {', '.join(sorted(missing))}."))
+    return [*prefix, *messages]
+
+
+def _refresh_prompt_cache():
+    """Extend the cache's TTL; if it already expired (idle process), create it again or go inline."""
+    global _prompt_cache
+    try:
+        _prompt_cache.update(ttl=PROMPT_CACHE_TTL)
+        return
+    except Exception as e:
+        log.warning("prompt cache refresh failed, recreating it: %s", e)
+    _prompt_cache = _create_prompt_cache()
+    # Models bound to the old cache name are stale either way
+    build_model.cache_clear()
+    batched_model_for.cache_clear()
+
+
+class BatchedLLM:
+    """
+    Micro-batcher around a chat model: concurrent invoke() calls are buffered for up to
+    `max_wait` seconds (or `max_batch_size` calls) and sent with one model.batch(...).
+    With max_wait=0 calls go straight to the model on the caller's thread.
+    """
+
+    def __init__(self, runnable, max_batch_size: int = 8, max_wait: float = LLM_BATCH_WAIT):
+        self.runnable = runnable
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def invoke(self, messages, config=None):
+        if self.max_wait <= 0:
+            return self.runnable.invoke(messages, config)
+        fut = Future()
+        self._queue.put((messages, config, fut))
+        self._ensure_worker()
+        return fut.result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            inputs = [messages for messages, _, _ in batch]
+            configs = [config or {} for _, config, _ in batch]
+            try:
+                results = self.runnable.batch(inputs, configs, return_exceptions=True)
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, _, fut), res in zip(batch, results):
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+
+
+@lru_cache(maxsize=16)
+def batched_model_for(tool_names: frozenset) -> BatchedLLM:
+    # One batcher per tool set: a batch can only be sent to one bound model
+    return BatchedLLM(build_model(tool_names))
+
+
+batched_model = batched_model_for(ALL_TOOL_NAMES)
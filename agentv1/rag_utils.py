@@ -4,14 +4,20 @@ from __future__ import annotations
 import os
 import pickle
 import re
+import asyncio
+import logging
+import shutil
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 
 from dotenv import load_dotenv
 load_dotenv()
 
 import numpy as np
-from rank_bm25 import BM25Okapi
+from bm25_index import IncrementalBM25, bm25_paths, load_bm25_files
 from langchain_chroma import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 
@@ -23,6 +29,25 @@ BM25_DB_PATH.mkdir(parents=True, exist_ok=True)
 
 GEMINI_EMBED_MODEL = "models/text-embedding-004"
 TOKEN_PATTERN = re.compile(r"\w+")
+SLUG_PATTERN = re.compile(r"[^a-z0-9]+")
+PREVIEW_CHARS = 400
+_ELLIPSIS = "..."
+
+# HNSW settings for per-course collections. Only applied when a collection is created;
+# existing collections keep the index they were built with.
+HNSW_CONFIG = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 100,
+}
+
+# Serve collections from a RAM-backed copy (tmpfs) to skip cold-cache disk reads after boot.
+# The on-disk DB stays the source of truth (the indexer writes there); copies are read-only.
+CHROMA_USE_TMPFS  = os.getenv("CHROMA_USE_TMPFS", "").lower() in ("1", "true", "yes")
+CHROMA_TMPFS_PATH = Path(os.getenv("CHROMA_TMPFS_PATH", "/dev/shm/chroma_db"))
+
+log = logging.getLogger(__name__)
 
 API_KEY = os.getenv("GOOGLE_API_KEY")
 if not API_KEY:
@@ -41,8 +66,7 @@ def get_embeddings():
 
 # ---------- Helpers ----------
 def slug(s: str) -> str:
-    import re as _re
-    return _re.sub(r"[^a-z0-9]+", "_", s.lower()).strip("_")
+    return SLUG_PATTERN.sub("_", s.lower()).strip("_")
 
 def ensure_list(x):
     if x is None:
@@ -52,24 +76,271 @@ def ensure_list(x):
     return [x]
 
 
-def get_vector_store_for_course(course: str):
+# ---------- Query caches (repeat questions skip the embed call and the regex scan) ----------
+# Query vectors: an LRU shared by embed_query and embed_queries (batch misses are filled in one request)
+QUERY_VEC_CACHE_SIZE = 1024
+_query_vecs: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+_query_vecs_lock = threading.Lock()
+
+def embed_queries(queries: List[str]) -> List[Tuple[float, ...]]:
+    """Query vectors for several queries; the ones not cached yet are embedded in a single request."""
+    known, misses = {}, []
+    with _query_vecs_lock:
+        for q in dict.fromkeys(queries):
+            if q in _query_vecs:
+                _query_vecs.move_to_end(q)
+                known[q] = _query_vecs[q]
+            else:
+                misses.append(q)
+    if misses:
+        if len(misses) == 1:
+            vecs = [get_embeddings().embed_query(misses[0])]
+        else:
+            vecs = get_embeddings().embed_documents(misses, task_type="RETRIEVAL_QUERY")
+        fresh = {q: tuple(vec) for q, vec in zip(misses, vecs)}
+        known.update(fresh)
+        with _query_vecs_lock:
+            _query_vecs.update(fresh)
+            while len(_query_vecs) > QUERY_VEC_CACHE_SIZE:
+                _query_vecs.popitem(last=False)
+    return [known[q] for q in queries]
+
+def embed_query(query: str) -> Tuple[float, ...]:
+    return embed_queries([query])[0]
+
+@lru_cache(maxsize=1024)
+def query_tokens(query: str) -> Tuple[str, ...]:
+    return tuple(TOKEN_PATTERN.findall(query.lower()))
+
+def similarity_search_by_query_vector(vs, query_vec, k: int):
+    """Same (doc, relevance) pairs as vs.similarity_search_with_relevance_scores, from a precomputed query vector."""
+    relevance = vs._select_relevance_score_fn()
+    hits = vs.similarity_search_by_vector_with_relevance_scores(list(query_vec), k=k)  # (doc, distance)
+    return [(doc, relevance(dist)) for doc, dist in hits]
+
+
+# Touched by the indexer after it writes a collection. Chroma's own files can't be the cache key:
+# opening a collection rewrites chroma.sqlite3 and queries rewrite the HNSW .bin files
+COLLECTION_MARKER = ".indexed"
+
+def mark_collection_indexed(disk_dir: Path) -> None:
+    (disk_dir / COLLECTION_MARKER).touch()
+
+def _collection_version(disk_dir: Path) -> int | None:
+    """A collection's cache key (one stat): its marker's mtime, 0 if it predates the marker, None if there's no collection."""
+    try:
+        return (disk_dir / COLLECTION_MARKER).stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0 if disk_dir.exists() else None
+
+_tmpfs_pruned: set = set()  # collections whose copies from earlier processes were removed
+
+def _tmpfs_dir(disk_dir: Path, version) -> Path:
+    return CHROMA_TMPFS_PATH / f"{disk_dir.name}@{version}"
+
+def tmpfs_copy(disk_dir: Path, version: int | None = None) -> Path:
+    """
+    RAM-backed copy of a collection directory, re-copied whenever the disk version is newer.
+    Each version gets its own directory; get_vector_store_for_course removes a version's copy
+    when its client leaves the store cache. Copies left by earlier processes are removed here.
+    """
+    version = _collection_version(disk_dir) if version is None else version
+    ram_dir = _tmpfs_dir(disk_dir, version)
+    if disk_dir.name not in _tmpfs_pruned:
+        _tmpfs_pruned.add(disk_dir.name)
+        for old in CHROMA_TMPFS_PATH.glob(f"{disk_dir.name}@*"):
+            if old != ram_dir:
+                shutil.rmtree(old, ignore_errors=True)
+    if not ram_dir.exists():
+        tmp = ram_dir.with_name(ram_dir.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(disk_dir, tmp)
+        tmp.rename(ram_dir)
+    return ram_dir
+
+# ---------- Per-course store cache ----------
+# Chroma (SQLite + HNSW) and the BM25 package are loaded into memory once and reused across
+# queries. An entry is reloaded when its files on disk change, e.g. after the indexer ran in
+# another process (an open store wouldn't see those writes). At most COURSE_CACHE_SIZE entries
+# stay open; replaced and evicted entries are closed.
+COURSE_CACHE_SIZE = 64
+_course_cache: "OrderedDict[Tuple[str, str], Tuple[Any, Any, Any]]" = OrderedDict()  # (kind, course_slug) -> (version, value, close)
+_course_cache_lock = threading.Lock()
+_load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+def _release(entry) -> None:
+    _, value, close = entry
+    if close is not None:
+        try:
+            close(value)
+        except Exception as e:
+            log.warning("closing a cached course store failed: %s", e)
+
+def _cached(kind: str, cslug: str, version, load, close=None):
+    """
+    Cached value for (kind, cslug) at `version`, else load() it. close(value) runs when the
+    entry is replaced by a newer version, evicted or invalidated.
+    """
+    key = (kind, cslug)
+    with _course_cache_lock:
+        hit = _course_cache.get(key)
+        if hit is not None and hit[0] == version:
+            _course_cache.move_to_end(key)
+            return hit[1]
+        lock = _load_locks.setdefault(key, threading.Lock())
+    # One loader per entry: a query that arrives mid-prewarm waits for that load instead of repeating it
+    with lock:
+        with _course_cache_lock:
+            hit = _course_cache.get(key)
+            if hit is not None and hit[0] == version:
+                return hit[1]
+            stale = _course_cache.pop(key, None)
+        # Close the old version before opening the new one: Chroma shares one client system per
+        # path, so a client opened first would just reuse the stale one's state
+        if stale is not None:
+            _release(stale)
+        value = load()
+        with _course_cache_lock:
+            _course_cache[key] = (version, value, close)
+            evicted = []
+            while len(_course_cache) > COURSE_CACHE_SIZE:
+                old_key, entry = _course_cache.popitem(last=False)
+                _load_locks.pop(old_key, None)
+                evicted.append(entry)
+        for entry in evicted:
+            _release(entry)
+        return value
+
+def invalidate_course_cache(course: str) -> None:
+    """Drop (and close) a course's cached stores; the next query reopens them."""
+    cslug = slug(course)
+    with _course_cache_lock:
+        dropped = [_course_cache.pop((kind, cslug), None) for kind in ("vs", "bm25")]
+    for entry in dropped:
+        if entry is not None:
+            _release(entry)
+
+def _close_vector_store(vs) -> None:
+    vs._client.close()  # releases the SQLite/HNSW handles once no other client shares the path
+
+def get_vector_store_for_course(course: str, collection_metadata: Dict[str, Any] = HNSW_CONFIG):
     """
     Loads the Chroma vector store for a specific course (collection is persisted per-course).
     """
-    persist_directory = f"{CHROMA_DB_PATH}/{slug(course)}_collection"
-    return Chroma(
-        persist_directory=persist_directory,
-        embedding_function=get_embeddings(),
-    )
+    disk_dir = Path(CHROMA_DB_PATH) / f"{slug(course)}_collection"
+    version = _collection_version(disk_dir)
+
+    def load():
+        persist_directory = disk_dir.as_posix()
+        if CHROMA_USE_TMPFS and version is not None:
+            persist_directory = tmpfs_copy(disk_dir, version).as_posix()
+        return Chroma(
+            persist_directory=persist_directory,
+            embedding_function=get_embeddings(),
+            collection_metadata=collection_metadata,
+        )
+    def close(vs):
+        _close_vector_store(vs)
+        if CHROMA_USE_TMPFS and version is not None:
+            # Replaced by a newer version (or evicted): nothing reads this copy any more
+            shutil.rmtree(_tmpfs_dir(disk_dir, version), ignore_errors=True)
+    return _cached("vs", slug(course), version, load, close)
+
+def fetch_chunks(vs, chunk_ids: List[int]) -> Dict[int, Tuple[str, Dict[str, Any]]]:
+    """(text, metadata) by chunk_id from a course's Chroma collection."""
+    got = vs.get(where={"chunk_id": {"$in": chunk_ids}}, include=["documents", "metadatas"])
+    return {
+        int(m["chunk_id"]): (doc, m)
+        for doc, m in zip(got.get("documents", []), got.get("metadatas", []))
+        if m is not None and doc is not None
+    }
 
 def load_bm25_pkg(course: str) -> Dict[str, Any]:
+    cslug = slug(course)
+    files = (*bm25_paths(BM25_DB_PATH, cslug), BM25_DB_PATH / f"{cslug}_bm25.pkl")
+    version = tuple(p.stat().st_mtime_ns if p.exists() else None for p in files)
+    return _cached("bm25", cslug, version, lambda: _load_bm25_pkg(course))
+
+def _load_bm25_pkg(course: str) -> Dict[str, Any]:
+    pkg = load_bm25_files(BM25_DB_PATH, slug(course))  # dict with keys: bm25, chunks, metas
+    if pkg is not None:
+        return pkg
+    # Courses indexed before the .npz format still have a BM25Okapi pickle
     pkl = BM25_DB_PATH / f"{slug(course)}_bm25.pkl"
     if not pkl.exists():
-        raise FileNotFoundError(f"No BM25 pickle found for course '{course}': {pkl}")
+        raise FileNotFoundError(f"No BM25 index found for course '{course}': {pkl.with_suffix('.npz')}")
     with pkl.open("rb") as f:
-        return pickle.load(f)  # dict with keys: bm25, tokens, chunks, metas
+        pkg = pickle.load(f)  # dict with keys: bm25, tokens, chunks, metas
+    pkg["bm25"] = IncrementalBM25.from_legacy_pickle(pkg)
+    return pkg
 
 # ---------- Hybrid search ----------
+async def _retrieve_one(course: str, query: str, query_vec_task, k_bm25: int, k_embed: int):
+    """
+    Load one course's stores and run its BM25 scoring and vector search concurrently.
+    Returns (vs, pkg, bm25_hits, emb_hits); hits are [(chunk_id, normalized score)].
+    """
+    async def load_vs():
+        try:
+            return await asyncio.to_thread(get_vector_store_for_course, course)
+        except Exception as e:
+            log.warning("skip vectors for %s: %s", course, e)
+            return None
+
+    async def load_pkg():
+        try:
+            return await asyncio.to_thread(load_bm25_pkg, course)  # {bm25, tokens, chunks, metas}
+        except Exception as e:
+            log.warning("skip BM25 for %s: %s", course, e)
+            return None
+
+    def bm25_hits(pkg):
+        bm25 = pkg["bm25"]
+        # Only docs sharing a query term are scored; the rest are an implicit 0
+        ids, scores = bm25.sparse_scores(list(query_tokens(query)))
+        if not scores.size:
+            return []
+        lo = scores.min() if scores.size == bm25.corpus_size else 0.0
+        hi = scores.max()
+        # Top-k by partition (O(N)), then sort just those k; normalization keeps the full-corpus range
+        k = min(k_bm25, scores.size)
+        top = np.argpartition(scores, -k)[-k:] if k < scores.size else np.arange(k)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        sel_norm = (scores[top] - lo) / (hi - lo + 1e-9)
+        return [(int(i), float(sc)) for i, sc in zip(ids[top], sel_norm)]
+
+    async def search_bm25(pkg_task):
+        pkg = await pkg_task
+        # get_scores is CPU-bound numpy work: keep it off the event loop
+        return [] if pkg is None else await asyncio.to_thread(bm25_hits, pkg)
+
+    async def search_vectors(vs_task):
+        vs = await vs_task
+        if vs is None:
+            return []
+        query_vec = await query_vec_task
+        try:
+            hits = await asyncio.to_thread(similarity_search_by_query_vector, vs, query_vec, k_embed)
+        except Exception as e:
+            # e.g. the store was closed because the course was re-indexed mid-query
+            log.warning("skip vectors for %s: %s", course, e)
+            return []
+        if not hits:
+            return []
+        emb_scores = np.array([float(s) for _, s in hits], dtype=float)
+        lo, hi     = emb_scores.min(), emb_scores.max()
+        emb_norm   = (emb_scores - lo) / (hi - lo + 1e-9)
+        return [
+            (chunk_id, float(sc))
+            for (doc, _), sc in zip(hits, emb_norm)
+            if (chunk_id := int(doc.metadata.get("chunk_id", -1))) >= 0
+        ]
+
+    vs_task  = asyncio.ensure_future(load_vs())
+    pkg_task = asyncio.ensure_future(load_pkg())
+    bm_hits, emb_hits = await asyncio.gather(search_bm25(pkg_task), search_vectors(vs_task))
+    return vs_task.result(), pkg_task.result(), bm_hits, emb_hits
+
 def hybrid_search(
     query: str,
     courses,
@@ -85,94 +356,92 @@ def hybrid_search(
     courses: str | List[str]
     Returns: List[{"text", "meta", "score", "preview"}]
     """
-    import numpy as np
+    return asyncio.run(hybrid_search_async(query, courses, k_final, k_bm25, k_embed, w_bm25, w_emb))
 
-    fused = {}  # key: (course_slug, chunk_id) -> score
+async def hybrid_search_async(
+    query: str,
+    courses,
+    k_final: int = 6,
+    k_bm25: int = 20,
+    k_embed: int = 12,
+    w_bm25: float = 0.25,
+    w_emb: float = 0.75,
+    query_vec=None,
+):
+    """
+    Async hybrid_search: every course is retrieved at the same time.
+    query_vec: optional awaitable for the query vector (hybrid_search_batch shares one embed request).
+    """
+    # Fused scores as flat arrays (one entry per distinct hit): owning course, chunk id, score
+    fused_course, fused_ids, fused_scores = [], [], []
     # Keep per-course bm25 packages for assembly later
     bm25_pkgs = {}  # course_slug -> pkg dict
     vector_stores = {}  # course_slug -> Chroma
 
-    for course in courses:
-        course = course[0]
-        cslug = slug(course)
+    courses = [course[0] for course in courses]
+    cslugs = [slug(c) for c in courses]
+    # The query is embedded once (and cached) rather than by every course's vector store
+    query_vec_task = asyncio.ensure_future(query_vec if query_vec is not None else asyncio.to_thread(embed_query, query))
+    results = await asyncio.gather(*(_retrieve_one(c, query, query_vec_task, k_bm25, k_embed) for c in courses))
 
-        # --- Load stores (skip missing gracefully) ---
-        try:
-            vs = get_vector_store_for_course(course)
+    for ci, (cslug, (vs, pkg, bm_hits, emb_hits)) in enumerate(zip(cslugs, results)):
+        if vs is not None:
             vector_stores[cslug] = vs
-        except Exception as e:
-            print(f"[hybrid] skip vectors for {course}: {e}")
-            vs = None
-
-        try:
-            pkg = load_bm25_pkg(course)  # {bm25, tokens, chunks, metas}
+        if pkg is not None:
             bm25_pkgs[cslug] = pkg
-        except Exception as e:
-            print(f"[hybrid] skip BM25 for {course}: {e}")
-            pkg = None
+        if not (bm_hits or emb_hits):
+            continue
+        ids = np.array([idx for idx, _ in bm_hits] + [idx for idx, _ in emb_hits], dtype=np.int64)
+        weighted = np.array([w_bm25 * sc for _, sc in bm_hits] + [w_emb * sc for _, sc in emb_hits])
+        uniq, inverse = np.unique(ids, return_inverse=True)  # chunks hit by both retrievers add up
+        fused_course.append(np.full(uniq.size, ci))
+        fused_ids.append(uniq)
+        fused_scores.append(np.bincount(inverse, weights=weighted))
 
-        # --- BM25 per course ---
-        if pkg is not None:
-            bm25 = pkg["bm25"]
-            chunks = pkg["chunks"]
-            metas  = pkg["metas"]
-
-            tokens = TOKEN_PATTERN.findall(query.lower())
-            bm_scores = bm25.get_scores(tokens)  # np.ndarray
-            if bm_scores.size:
-                bm_range = np.ptp(bm_scores)
-                bm_norm  = (bm_scores - bm_scores.min()) / (bm_range + 1e-9)
-                top_idx  = np.argsort(bm_norm)[::-1][:k_bm25]
-                for i in top_idx:
-                    key = (cslug, int(i))
-                    fused[key] = fused.get(key, 0.0) + w_bm25 * float(bm_norm[i])
-
-        # --- Vector per course ---
-        if vs is not None:
-            hits = vs.similarity_search_with_relevance_scores(query, k=k_embed)
-            if hits:
-                emb_scores = np.array([float(s) for _, s in hits], dtype=float)
-                emb_range  = np.ptp(emb_scores)
-                emb_norm   = (emb_scores - emb_scores.min()) / (emb_range + 1e-9)
-                for (doc, _), sc in zip(hits, emb_norm):
-                    chunk_id = int(doc.metadata.get("chunk_id", -1))
-                    if chunk_id >= 0:
-                        key = (cslug, chunk_id)
-                        fused[key] = fused.get(key, 0.0) + w_emb * float(sc)
-
-    if not fused:
+    if not fused_ids:
         return []
 
     # --- Global rank across all courses ---
-    best = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:k_final]
+    owner  = np.concatenate(fused_course)
+    ids    = np.concatenate(fused_ids)
+    scores = np.concatenate(fused_scores)
+    k = min(k_final, scores.size)
+    top = np.argpartition(-scores, k - 1)[:k] if k < scores.size else np.arange(k)
+    top = top[np.argsort(-scores[top], kind="stable")]
+    best = [((cslugs[owner[i]], int(ids[i])), float(scores[i])) for i in top]
+
+    # --- Chunks not in a BM25 sidecar (text not kept, or no package): one Chroma get() per course ---
+    chroma_chunks = {}  # (course_slug, chunk_id) -> (text, meta)
+    for cslug, vs in vector_stores.items():
+        pkg = bm25_pkgs.get(cslug)
+        if pkg is None or pkg.get("chunks") is None:
+            ids = [idx for (c, idx), _ in best if c == cslug]
+            if ids:
+                chroma_chunks.update(
+                    ((cslug, idx), hit) for idx, hit in fetch_chunks(vs, ids).items()
+                )
 
     # --- Assemble results ---
     out = []
     for (cslug, idx), score in best:
         pkg = bm25_pkgs.get(cslug)
-        if pkg is None:
-            # Fall back to pulling the doc from the vector store if needed
-            # but normally BM25 pkg should exist for assembly
-            vs = vector_stores.get(cslug)
-            doc, _ = vs.similarity_search_with_relevance_scores(query, k=1)[0] if vs else (None, None)
-            if doc is None:
-                # Skip if we can't assemble
-                continue
-            meta = dict(doc.metadata)
-            text = doc.page_content
+        chunks = pkg.get("chunks") if pkg is not None else None
+        if chunks is not None:
+            text, meta = chunks[idx], pkg["metas"][idx]
         else:
-            text = pkg["chunks"][idx]
-            meta = pkg["metas"][idx]
+            hit = chroma_chunks.get((cslug, idx))
+            if hit is None:
+                continue  # Skip if we can't assemble
+            text, meta = hit[0], pkg["metas"][idx] if pkg is not None else hit[1]
 
-        # annotate course (in case it's missing)
-        meta.setdefault("course", cslug)
+        # annotate course (in case it's missing); metas are shared with the cached package, so copy only then
+        if "course" not in meta:
+            meta = {**meta, "course": cslug}
 
         # Build preview skipping header (if present)
         hdr_len = int(meta.get("__header_len", 0))
-        if len(text) > hdr_len:
-            preview = text[hdr_len:hdr_len+400] + "..."
-        else:
-            preview = text[:400] + "..."
+        start = hdr_len if len(text) > hdr_len else 0
+        preview = f"{text[start:start + PREVIEW_CHARS]}{_ELLIPSIS}"
 
         out.append({
             "text": text,
@@ -184,6 +453,43 @@ def hybrid_search(
     return out
 
 
+def hybrid_search_batch(
+    queries: List[str],
+    courses,
+    k_final: int = 6,
+    k_bm25: int = 20,
+    k_embed: int = 12,
+    w_bm25: float = 0.25,
+    w_emb: float = 0.75,
+):
+    """
+    hybrid_search for several queries over the same courses.
+    Returns one result list (same shape as hybrid_search's) per query, in order.
+    """
+    return asyncio.run(hybrid_search_batch_async(queries, courses, k_final, k_bm25, k_embed, w_bm25, w_emb))
+
+async def hybrid_search_batch_async(
+    queries: List[str],
+    courses,
+    k_final: int = 6,
+    k_bm25: int = 20,
+    k_embed: int = 12,
+    w_bm25: float = 0.25,
+    w_emb: float = 0.75,
+):
+    """Async hybrid_search_batch: the queries are embedded in one request and all searches run concurrently."""
+    queries = list(queries)
+    vecs_task = asyncio.ensure_future(asyncio.to_thread(embed_queries, queries))
+
+    async def query_vec(i: int):
+        return (await vecs_task)[i]
+
+    return list(await asyncio.gather(*(
+        hybrid_search_async(q, courses, k_final, k_bm25, k_embed, w_bm25, w_emb, query_vec=query_vec(i))
+        for i, q in enumerate(queries)
+    )))
+
+
 def format_chunk(idx: int, item: Dict[str, Any]) -> str:
     course = item["meta"].get("course", "unknown")
     src    = item["meta"].get("file_path", item["meta"].get("source", "unknown"))
@@ -191,3 +497,22 @@ def format_chunk(idx: int, item: Dict[str, Any]) -> str:
     text   = item.get("preview") or (item["text"][:400] + "...")
     return f"{idx}. [{course}] (score={score:.3f}) {src}\n{text}"
 
+
+# ---------- Prewarm ----------
+def indexed_course_slugs() -> List[str]:
+    """Slugs of every course with a BM25 package or a Chroma collection on disk."""
+    slugs = {p.name.rsplit("_bm25", 1)[0] for p in BM25_DB_PATH.glob("*_bm25.*") if p.suffix in (".npz", ".pkl")}
+    chroma_dir = Path(CHROMA_DB_PATH)
+    if chroma_dir.exists():
+        slugs.update(p.name[:-len("_collection")] for p in chroma_dir.glob("*_collection") if p.is_dir())
+    return sorted(slugs)
+
+def prewarm() -> None:
+    """Open every indexed course's stores, so the first query doesn't pay for loading them (app.py runs this at startup)."""
+    for cslug in indexed_course_slugs():  # slug() is idempotent, so a slug works as the course name
+        for load in (load_bm25_pkg, get_vector_store_for_course):
+            try:
+                load(cslug)
+            except Exception as e:
+                log.warning("prewarm: skip %s for %s: %s", load.__name__, cslug, e)
+
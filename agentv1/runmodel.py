@@ -1,54 +1,50 @@
 # runmodel.py
-from graph import graph
-from langchain_core.messages import SystemMessage, HumanMessage
+from typing import Iterator, Optional
+from graph import graph, checkpointer
+from langchain_core.messages import HumanMessage
 import tools
+from backend_google import google_drive2
 
-# Use a STABLE thread_id so the checkpointer can restore the same thread.
-cfg = {"configurable": {"thread_id": "demo-thread-1"}}
+# Checkpoints are keyed by thread_id: one conversation per user/session (the API derives it
+# from the request). Callers without one (CLI) share the default thread.
+DEFAULT_THREAD_ID = "demo-thread-1"
 new_class = ""
 
 def change_selected_class(new_class):
     tools.change_selected_class_tools(new_class)
 
-def run_once_and_get_state(input_state):
-    last = None
-    for s in graph.stream(input_state, stream_mode="values", config=cfg):
-        s["messages"][-1].pretty_print()
-        last = s
-    return last or input_state
-
-# 1) Seed with system message
-state = {
-    "messages": [SystemMessage(
-        content=(
-            """
-            You are a helpful AI assistant for helping students with their classes. As an AI, you should try your hardest to help your student succeed. You should ask follow-up questions if the student's prompt is not clear. You will be referred to as AI in instructions. The student has already declared which classes they want to create content for. You will be able to see the content after you make tool calls. 
-            The AI has access to five tools. get_information_from_database, create_note_sheet, answer_question, get_entire_lecture_notes, get_current_date. 
-            Two of these tools: create_note_sheet, answer_question are direct returning tools, which means that they are the last thing the AI will do. The AI will use the other three tools to help you gather information for these tools. The AI should call create_note_sheet OR answer_question but never both.
-            Using the create_note_sheet tool will allow the AI to push a note sheet to the students' google drive. The AI will need to gather information before doing this. The AI should not create a note sheet unless specifically asked.You should format for a google doc sheet. Markdown will not compile correctly, so do not try to add bold using '*'.
-            Using the answer_question tool will push a text response to the user. It will not generate a note sheet but it useful for answering questions that the user asks. The AI will also need to gather information to be able to do this. 
-            The tool get_information_from_database is used to access the students' information repository. The AI will almost ALWAYS need to call it, unless the AI is asked a question that doesn't require gathering more information, such as 'can you reformat your response'. The database call returns information on the lecture date, name, course, module, path, and a relevant part of the lecture. It is important for the AI to understand how the query works, because the AI can make the query more effective if it modifies the user's query to be more specific. The database will look at important keywords to query similar information. So a query ‘how does the quadratic formula work’, is better queried as ‘quadratic formula worked examples practice problems step-by-step solutions since it uses better keywords. 
-            The tool get_current_date is used to access the current date. This is important for the AI because it will need it to understand which lectures are closest to the current date. It will allow the AI to answer questions like 'load my lectures for tomorrow', since querying the database with just a date will load lecture information from those dates. You only need to call this tool if you are given a question that depends on time.
-            The tool get_entire_lecture_notes is used to access a file on the student's computer that contains the entire lecture file. If the AI calls this tool with the correct path, then it will be given the entire lecture. It is important to make sure that the AI contains the correct path before calling this function. The AI can only get path information from the get_information_from_database. 
-            Examples:
-            User query: 'give me information on the quadratic formula'. The AI calls the tool get_information_from_database with the rephrased query then answer_question
-            User query: 'give me information on my lecture tomorrow'. The AI checks the current date with get_current_date and reformats the query to look for lectures tomorrow and calls get_information_from_database. Then the AI gets the path for lectures tomorrow and calls the get_entire_lecture_notes tool. The AI then either calls answer_question or create_note_sheet depending on what the user asked.
-            Remember, you are the AI. You are an assistant to help students succeed. You should be detailed in your response and try your hardest to help your students. You are able to ask follow-up questions but do not be excessive, as an AI, you sometimes must make assumptions. 
-           """
-        )
-    )],
-    "number_of_steps": 0,
-}
-state = run_once_and_get_state(state)
-
-def prompt(text: str) -> str:
-    global state
-    state["messages"].append(HumanMessage(content=text))
-    state = run_once_and_get_state(state)
+# Tool calls whose argument is the reply itself: tool name -> argument holding the text
+REPLY_TOOL_ARGS = {"answer_question": "ai_response"}
+
+def reset_thread(thread_id: str = DEFAULT_THREAD_ID) -> None:
+    """Forget a conversation: its checkpoints are deleted and the next turn starts empty."""
+    checkpointer.delete_thread(thread_id)
+
+def prompt_stream(text: str, drive_token: Optional[str] = None, thread_id: str = DEFAULT_THREAD_ID) -> Iterator[str]:
+    """
+    Run one turn and yield the reply as it is produced: model text, plus the answer passed to
+    answer_question as soon as the model makes that call. Tool results aren't yielded.
+    """
+    if drive_token:
+        google_drive2.set_drive_token(drive_token)
+    # Only tell the graph whether a token exists; the token itself stays out of the checkpointed config
+    config = {"configurable": {"thread_id": thread_id, "has_google_token": bool(google_drive2.get_drive_token())}}
+    # Only the new message goes in: the checkpointer restores the thread's history, and
+    # graph.call_model prepends the system prompt (model.SYSTEM_PROMPT) every turn
+    turn = {"messages": [HumanMessage(content=text)], "number_of_steps": 0}
+    for msg, _ in graph.stream(turn, stream_mode="messages", config=config):
+        if msg.type not in ("ai", "AIMessageChunk"):
+            continue
+        if isinstance(msg.content, str) and msg.content:
+            yield msg.content
+        for call in getattr(msg, "tool_calls", None) or []:
+            arg = REPLY_TOOL_ARGS.get(call["name"])
+            if arg and call["args"].get(arg):
+                yield call["args"][arg]
+
+def prompt(text: str, drive_token: Optional[str] = None, thread_id: str = DEFAULT_THREAD_ID) -> str:
+    for _ in prompt_stream(text, drive_token, thread_id):
+        pass
     print(new_class)
+    state = graph.get_state({"configurable": {"thread_id": thread_id}}).values
     return state["messages"][-1].content
-
-
-
-
-
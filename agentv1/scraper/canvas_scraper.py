@@ -1,14 +1,54 @@
 import requests
 import io
+import re
+import os
+import json
+import asyncio
+import aiohttp
+import aiofiles
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from scraper import pdf_to_text
 from scraper import pptx_to_text
 from scraper import docx_to_text
 from pathlib import Path
 import time
 
+SLUG_PATTERN = re.compile(r"[^a-z0-9]+")
+CANVAS_CONCURRENCY = 16  # max in-flight Canvas requests (API calls + file downloads)
+EXTRACT_QUEUE_SIZE = 16  # downloaded files waiting for an extractor; a full queue holds back downloads
+
 def slug(s: str) -> str:
-    import re as _re
-    return _re.sub(r"[^a-z0-9]+", "_", s.lower()).strip("_")
+    return SLUG_PATTERN.sub("_", s.lower()).strip("_")
+
+# ---------- Extraction pool (PDF/PPTX/DOCX parsing is CPU-bound pure Python) ----------
+_extract_pool = None
+def get_extract_pool() -> ProcessPoolExecutor:
+    global _extract_pool
+    if _extract_pool is None:
+        _extract_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _extract_pool
+
+def bytes_to_txt_content(extract, data: bytes, filename: str):
+    # Runs in a worker process: takes raw bytes (a BytesIO doesn't pickle) and rewraps them for the extractor.
+    # Returns the .txt content; the event loop writes it so the worker can start on the next file
+    return extract(io.BytesIO(data), filename)
+
+# ---------- Per-course validator cache: data/{course}/.etags.json ----------
+# {item_id: {etag, last_modified, created_at, updated_at}} from the last scrape, so a rescrape
+# can send a conditional GET for each file's metadata and skip files that haven't changed
+ETAGS_FILE = ".etags.json"
+
+def load_etags(course_dir: Path) -> dict:
+    try:
+        with open(course_dir / ETAGS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_etags(course_dir: Path, etags: dict) -> None:
+    with open(course_dir / ETAGS_FILE, "w", encoding="utf-8") as f:
+        json.dump(etags, f)
 
 
 
@@ -42,105 +82,166 @@ def scrape_canvas(access_token):
         "timestamp": int(time.time())
     } 
 
-    def fetch_file_bytes(file_url: str) -> io.BytesIO:
+    async def get_json(session, sem, url, params=None):
+        async with sem:
+            async with session.get(url, headers=headers, params=params) as resp:
+                return await resp.json(content_type=None)
+
+    async def get_file_json(session, sem, url, cached):
+        # Conditional GET on the file's metadata; returns (None, headers) on 304 Not Modified
+        cond = {}
+        if cached.get("etag"):
+            cond["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            cond["If-Modified-Since"] = cached["last_modified"]
+        async with sem:
+            async with session.get(url, headers={**headers, **cond}) as resp:
+                if resp.status == 304:
+                    return None, resp.headers
+                return await resp.json(content_type=None), resp.headers
+
+    async def fetch_file_bytes(session, file_url: str) -> bytes:
+        # Caller holds a request slot (sem)
         # Try auth header first
-        resp = requests.get(file_url, headers=headers, stream=True)
-        if resp.status_code in (401, 403):
-            # Some Canvas file links don’t honor headers, need access_token query
-            sep = "&" if "?" in file_url else "?"
-            resp = requests.get(f"{file_url}{sep}access_token={ACCESS_TOKEN}", stream=True)
-        resp.raise_for_status()
-        buf = io.BytesIO()
-        for chunk in resp.iter_content(chunk_size=1024*1024):
-            if chunk:
-                buf.write(chunk)
-        buf.seek(0)
-        return buf
-
-
-    def scrape_canvas_to_txts():
-        resp = requests.get(f"{BASE_URL}/courses", headers=headers, params={"enrollment_state": "active"})
-        COURSE_JSON = resp.json()
-        ids = []
-        file_infos = []
-        file_infos_for_db = [] 
-        course_names = []
-        base = Path.cwd()
-        try:
-            path = base / "data"
-            path.mkdir(parents=True, exist_ok=False)
-            print(f"Created folder: {path}")
-        except FileExistsError:
-            print(f"Folder already exists: {path}")
-
-        base = base / "data"
-        for course in COURSE_JSON:
-            course_name = course['name']
-            course_id = course["id"]
-            course_name = slug(course_name)
-            if course_name not in course_names:
-                course_names.append(course_name)
-                print(course_names)
-                courseNames["courses"].append({"name": course_name})
-                path = base / course_name
-                try:
-                    path.mkdir(parents=True, exist_ok=False)
-                    print(f"Created folder: {path}")
-                except FileExistsError:
-                    print(f"Folder already exists: {path}")
-            resp = requests.get(f"{BASE_URL}/courses/{course_id}/modules", headers=headers)
-            MODULE_JSON = resp.json()
-            for module in MODULE_JSON: 
-                module_name = module["name"]
-                module_id = module["id"]
-                resp = requests.get(f"{BASE_URL}/courses/{course_id}/modules/{module_id}/items", headers=headers)
-                ITEM_JSON = resp.json()
-                for item in ITEM_JSON:
-                    if item["type"] == "File": #only want to look at items that have the file type 
-                        url = item["url"]
-                        file_info = {"file_name": slug(item["title"]), "date_created": None, "course": course_name, "module": module_name, "item_file_url": item["url"], "file_download_url": None}
-                        file_infos.append(file_info)
-                        resp = requests.get(file_info["item_file_url"], headers=headers)
-                        FILE_JSON = resp.json()
-                        file_info["date_created"] = FILE_JSON["created_at"]
-
-
-                        if "pdf" in FILE_JSON["content-type"].lower():
-                            file_info["file_download_url"] = FILE_JSON["url"]
-                            buf = fetch_file_bytes(file_info["file_download_url"])
-                            out_path = pdf_to_text.save_pdf_bytes_as_txt(buf, file_info["file_name"] + ".txt", output_dir=base/course_name)
-                            if out_path is not None:
-                                file_info_for_db = {"name": file_info["file_name"] +".txt", "date": file_info["date_created"], "course": file_info["course"], "module": file_info["module"], "path": f"{base}/{course_name}/{file_info['file_name']}.txt"}
-                                file_infos_for_db.append(file_info_for_db)
-                            
-
-                        elif "application/vnd.openxmlformats-officedocument.presentationml.presentation" in FILE_JSON["content-type"]:
-                            file_info["file_download_url"] = FILE_JSON["url"]
-                            buf = fetch_file_bytes(file_info["file_download_url"])
-                            out_path = pptx_to_text.save_pptx_bytes_as_txt(buf, file_info["file_name"] + ".txt", output_dir=base/course_name)
-                            if out_path is not None:
-                                file_info_for_db = {"name": file_info["file_name"] +".txt", "date": file_info["date_created"], "course": file_info["course"], "module": file_info["module"], "path": f"{base}/{course_name}/{file_info['file_name']}.txt"}
-                                file_infos_for_db.append(file_info_for_db)
-
-                        elif "application/vnd.openxmlformats-officedocument.wordprocessingml.document" in FILE_JSON["content-type"]:
-                            file_info["file_download_url"] = FILE_JSON["url"]
-                            buf = fetch_file_bytes(file_info["file_download_url"])
-                            out_path = docx_to_text.save_docx_bytes_as_txt(buf, file_info["file_name"] + ".txt", output_dir=base/course_name)
-                            if out_path is not None:
-                                file_info_for_db = {"name": file_info["file_name"] +".txt", "date": file_info["date_created"], "course": file_info["course"], "module": file_info["module"], "path": f"{base}/{course_name}/{file_info['file_name']}.txt"}
-                                file_infos_for_db.append(file_info_for_db)
-                        else:
-                            print("couldn't open file")
-
-                    else:
-                        print("not a file")
+        async with session.get(file_url, headers=headers) as resp:
+            if resp.status not in (401, 403):
+                resp.raise_for_status()
+                return await resp.read()
+        # Some Canvas file links don’t honor headers, need access_token query
+        sep = "&" if "?" in file_url else "?"
+        async with session.get(f"{file_url}{sep}access_token={ACCESS_TOKEN}") as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+    # ---------- Pipeline: downloads (scrape_file) -> extract_q -> extractors (process pool) -> aiofiles write ----------
+    # Items whose titles slug to the same .txt finish concurrently: one writer per path at a
+    # time, so the file ends up as one item's text (last writer wins) rather than a mix
+    write_locks = defaultdict(asyncio.Lock)
+
+    async def extractor(extract_q):
+        loop = asyncio.get_running_loop()
+        while True:
+            done, extract, data, filename = await extract_q.get()
+            try:
+                done.set_result(await loop.run_in_executor(get_extract_pool(), bytes_to_txt_content, extract, data, filename))
+            except Exception as e:
+                done.set_exception(e)
+            finally:
+                extract_q.task_done()
+
+    def extractor_for(content_type: str):
+        if "pdf" in content_type.lower():
+            return pdf_to_text.pdf_txt_content
+        if "application/vnd.openxmlformats-officedocument.presentationml.presentation" in content_type:
+            return pptx_to_text.pptx_txt_content
+        if "application/vnd.openxmlformats-officedocument.wordprocessingml.document" in content_type:
+            return docx_to_text.docx_txt_content
+        return None
+
+    async def scrape_file(session, sem, extract_q, item, course_name, module_name, base, etags):
+        file_info = {"file_name": slug(item["title"]), "date_created": None, "course": course_name, "module": module_name, "item_file_url": item["url"], "file_download_url": None}
+        def record():
+            return {"name": file_info["file_name"] +".txt", "date": file_info["date_created"], "course": file_info["course"], "module": file_info["module"], "path": f"{base}/{course_name}/{file_info['file_name']}.txt"}
+
+        key = str(item["id"])
+        # Only trust the cache while the .txt it produced is still on disk
+        cached = etags.get(key, {}) if (base / course_name / f"{file_info['file_name']}.txt").exists() else {}
+        FILE_JSON, resp_headers = await get_file_json(session, sem, file_info["item_file_url"], cached)
+        if FILE_JSON is None or (cached and (FILE_JSON["created_at"], FILE_JSON.get("updated_at")) == (cached["created_at"], cached["updated_at"])):
+            # Unchanged since the last scrape: keep the existing .txt, no download/extract
+            if FILE_JSON is not None:
+                cached.update(etag=resp_headers.get("ETag"), last_modified=resp_headers.get("Last-Modified"))
+            file_info["date_created"] = cached["created_at"]
+            return record()
+        file_info["date_created"] = FILE_JSON["created_at"]
+
+        extract = extractor_for(FILE_JSON["content-type"])
+        if extract is None:
+            print("couldn't open file")
+            return None
+        file_info["file_download_url"] = FILE_JSON["url"]
+        done = asyncio.get_running_loop().create_future()
+        # The request slot is held until the extract queue takes the bytes, so downloads
+        # wait while extraction is behind instead of piling file bytes up in memory
+        async with sem:
+            data = await fetch_file_bytes(session, file_info["file_download_url"])
+            await extract_q.put((done, extract, data, file_info["file_name"] + ".txt"))
+        del data
+        text = await done
+        if text is None:
+            return None
+        txt_path = base / course_name / f"{file_info['file_name']}.txt"
+        async with write_locks[txt_path], aiofiles.open(txt_path, "w", encoding="utf-8") as f:
+            await f.write(text)
+        etags[key] = {"etag": resp_headers.get("ETag"), "last_modified": resp_headers.get("Last-Modified"),
+                      "created_at": FILE_JSON["created_at"], "updated_at": FILE_JSON.get("updated_at")}
+        return record()
+
+    async def scrape_module(session, sem, extract_q, course_id, course_name, module, base, etags):
+        module_name = module["name"]
+        module_id = module["id"]
+        ITEM_JSON = await get_json(session, sem, f"{BASE_URL}/courses/{course_id}/modules/{module_id}/items")
+        tasks = []
+        for item in ITEM_JSON:
+            if item["type"] == "File": #only want to look at items that have the file type 
+                tasks.append(scrape_file(session, sem, extract_q, item, course_name, module_name, base, etags))
+            else:
+                print("not a file")
+        return await asyncio.gather(*tasks)
+
+    async def scrape_course(session, sem, extract_q, course_id, course_name, base):
+        etags = load_etags(base / course_name)
+        MODULE_JSON = await get_json(session, sem, f"{BASE_URL}/courses/{course_id}/modules")
+        per_module = await asyncio.gather(*(scrape_module(session, sem, extract_q, course_id, course_name, m, base, etags) for m in MODULE_JSON))
+        save_etags(base / course_name, etags)
+        return [info for infos in per_module for info in infos if info is not None]
+
+    async def scrape_canvas_to_txts():
+        # Every Canvas request (API + file downloads) shares one bounded pool of in-flight requests
+        sem = asyncio.Semaphore(CANVAS_CONCURRENCY)
+        # One extractor per pool worker, so the pool always has the next file queued up
+        extract_q = asyncio.Queue(maxsize=EXTRACT_QUEUE_SIZE)
+        extractors = [asyncio.create_task(extractor(extract_q)) for _ in range(os.cpu_count() or 1)]
+        async with aiohttp.ClientSession() as session:
+            COURSE_JSON = await get_json(session, sem, f"{BASE_URL}/courses", params={"enrollment_state": "active"})
+            course_names = []
+            base = Path.cwd()
+            try:
+                path = base / "data"
+                path.mkdir(parents=True, exist_ok=False)
+                print(f"Created folder: {path}")
+            except FileExistsError:
+                print(f"Folder already exists: {path}")
+
+            base = base / "data"
+            tasks = []
+            for course in COURSE_JSON:
+                course_name = course['name']
+                course_id = course["id"]
+                course_name = slug(course_name)
+                if course_name not in course_names:
+                    course_names.append(course_name)
+                    print(course_names)
+                    courseNames["courses"].append({"name": course_name})
+                    path = base / course_name
+                    try:
+                        path.mkdir(parents=True, exist_ok=False)
+                        print(f"Created folder: {path}")
+                    except FileExistsError:
+                        print(f"Folder already exists: {path}")
+                tasks.append(scrape_course(session, sem, extract_q, course_id, course_name, base))
+            try:
+                per_course = await asyncio.gather(*tasks)
+            finally:
+                for t in extractors:
+                    t.cancel()
+        file_infos_for_db = [info for infos in per_course for info in infos]
         
         out_path = Path.cwd() / "file_infos.txt"
 
         with out_path.open("w", encoding="utf-8") as f:
             for file_info in file_infos_for_db:
                 f.write(f"{file_info}\n")
-    scrape_canvas_to_txts()
+    asyncio.run(scrape_canvas_to_txts())
     return courseNames
   # Return in test_courses format
-  
\ No newline at end of file
@@ -1,97 +1,113 @@
 # docx_to_text.py
-# pip install python-docx
+# pip install lxml
 
-import io, os, re, datetime
+import io, os, re, datetime, zipfile
 from pathlib import Path
-from typing import List, Iterable, Union
+from typing import Dict, List, Optional
 
-# Correct python-docx imports:
-from docx import Document as load_document          # loader function
-from docx.document import Document as DocxDocument  # class for isinstance checks
-from docx.table import _Cell, Table
-from docx.text.paragraph import Paragraph
+from lxml import etree
 
 # ---------- Extraction ----------
-
-def _is_heading(p: Paragraph) -> int:
-    """Return heading level 1..9 if paragraph style is Heading N, else 0."""
-    name = (p.style.name or "").strip() if p.style else ""
-    if name.startswith("Heading"):
-        parts = name.split()
-        if len(parts) == 2 and parts[1].isdigit():
-            lvl = int(parts[1])
-            if 1 <= lvl <= 9:
-                return lvl
+# Reads word/document.xml straight out of the .docx zip with lxml: one XPath per paragraph
+# for its text, no python-docx Paragraph/Table wrapper objects.
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+NS = {"w": W}
+def _w(name: str) -> str:
+    return f"{{{W}}}{name}"
+
+_BLOCKS    = etree.XPath("/w:document/w:body/*[self::w:p or self::w:tbl]", namespaces=NS)
+# Same inner content python-docx's Paragraph.text reads (runs, incl. runs inside hyperlinks)
+_RUN_ITEMS = etree.XPath(
+    "(./w:r | ./w:hyperlink/w:r)/*[self::w:t or self::w:tab or self::w:ptab or self::w:br"
+    " or self::w:cr or self::w:noBreakHyphen]",
+    namespaces=NS,
+)
+_STYLE_ID  = etree.XPath("string(./w:pPr/w:pStyle/@w:val)", namespaces=NS)
+_HAS_NUMPR = etree.XPath("boolean(./w:pPr/w:numPr)", namespaces=NS)
+_IND_LEFT  = etree.XPath("string(./w:pPr/w:ind/@w:left)", namespaces=NS)
+_ROWS      = etree.XPath("./w:tr", namespaces=NS)
+_CELLS     = etree.XPath("./w:tc", namespaces=NS)
+_PARAS     = etree.XPath("./w:p", namespaces=NS)
+
+_RUN_TEXT = {"tab": "\t", "ptab": "\t", "cr": "\n", "noBreakHyphen": "-"}
+
+def _paragraph_text(p) -> str:
+    parts = []
+    for e in _RUN_ITEMS(p):
+        tag = etree.QName(e).localname
+        if tag == "t":
+            parts.append(e.text or "")
+        elif tag == "br":
+            # line breaks only; page/column breaks add nothing
+            parts.append("\n" if e.get(_w("type"), "textWrapping") == "textWrapping" else "")
+        else:
+            parts.append(_RUN_TEXT[tag])
+    return "".join(parts)
+
+def _style_names(zf: zipfile.ZipFile) -> Dict[Optional[str], str]:
+    """styleId -> style name for paragraph styles; the default paragraph style is under None."""
+    try:
+        styles = etree.fromstring(zf.read("word/styles.xml"))
+    except KeyError:
+        return {}
+    names: Dict[Optional[str], str] = {}
+    for st in styles.iterfind("w:style", NS):
+        if st.get(_w("type")) != "paragraph":
+            continue
+        name = st.find("w:name", NS)
+        style_id = st.get(_w("styleId"))
+        names[style_id] = name.get(_w("val")) if name is not None else ""
+        if st.get(_w("default")) in ("1", "true", "on"):
+            names[None] = names[style_id]
+    return names
+
+def _heading_level(style: str) -> int:
+    """Return heading level 1..9 if the style is Heading N, else 0."""
+    parts = style.split()
+    if len(parts) == 2 and parts[0].lower() == "heading" and parts[1].isdigit():
+        lvl = int(parts[1])
+        if 1 <= lvl <= 9:
+            return lvl
     return 0
 
-def _is_list(p: Paragraph) -> bool:
-    """
-    Heuristic: treat paragraphs with list-related styles or numbering props as list items.
-    python-docx doesn't expose list level directly; use style + numPr presence.
-    """
-    name = (p.style.name or "").lower() if p.style else ""
-    if any(k in name for k in ("list", "bullet", "number")):
-        return True
-    # Fallback: inspect underlying XML for numbering (numPr)
-    try:
-        return p._p.pPr is not None and p._p.pPr.numPr is not None
-    except Exception:
-        return False
+def _is_list(p, style: str) -> bool:
+    """Heuristic: list-related style name, or numbering props (numPr) on the paragraph."""
+    name = style.lower()
+    return any(k in name for k in ("list", "bullet", "number")) or _HAS_NUMPR(p)
 
-def _list_level(p: Paragraph) -> int:
-    """
-    Best-effort indent level based on left indent in twips (1 level ≈ 360 twips ~ 0.25in).
-    """
+def _list_level(p) -> int:
+    """Best-effort indent level from the left indent in twips (1 level ≈ 360 twips ~ 0.25in)."""
+    left = _IND_LEFT(p)
     try:
-        ppr = p._p.pPr
-        if ppr is not None and ppr.ind is not None and ppr.ind.left is not None:
-            left = int(ppr.ind.left)
-            return max(0, min(6, left // 360))
-    except Exception:
-        pass
-    return 0
+        return max(0, min(6, int(left) // 360)) if left else 0
+    except ValueError:
+        return 0
 
-def _paragraph_to_lines(p: Paragraph) -> List[str]:
-    text = (p.text or "").replace("\r", "\n").strip()
+def _paragraph_to_lines(p, styles: Dict[Optional[str], str]) -> List[str]:
+    text = _paragraph_text(p).replace("\r", "\n").strip()
     if not text:
         return []
-    h = _is_heading(p)
+    style_id = _STYLE_ID(p)
+    style = styles.get(style_id if style_id in styles else None, "")
+    h = _heading_level(style)
     if h:
         hashes = "#" * min(6, h)
         return [f"{hashes} {text}"]
-    if _is_list(p):
+    if _is_list(p, style):
         lvl = _list_level(p)
         prefix = ("- " if lvl == 0 else "  " * lvl + "- ")
         return [prefix + text]
     return [text]
 
-def _iter_block_items(parent) -> Iterable[Union[Paragraph, Table]]:
-    """
-    Yield paragraphs and tables in document order for Document or _Cell.
-    """
-    if isinstance(parent, DocxDocument):
-        parent_elm = parent.element.body
-    elif isinstance(parent, _Cell):
-        parent_elm = parent._tc
-    else:
-        # Fallback for sections etc.
-        parent_elm = parent._element
-
-    for child in parent_elm.iterchildren():
-        if child.tag.endswith("}p"):
-            yield Paragraph(child, parent)
-        elif child.tag.endswith("}tbl"):
-            yield Table(child, parent)
-
-def _table_to_lines(tbl: Table) -> List[str]:
+def _table_to_lines(tbl) -> List[str]:
     lines = []
-    for row in tbl.rows:
+    for row in _ROWS(tbl):
         cells = []
-        for cell in row.cells:
-            cell_text = "\n".join((para.text or "").strip() for para in cell.paragraphs).strip()
-            cell_text = cell_text.replace("\r", "\n")
-            cells.append(cell_text)
-        line = "\t".join(s for s in cells if s is not None).strip()
+        for cell in _CELLS(row):
+            cell_text = "\n".join(_paragraph_text(para).strip() for para in _PARAS(cell)).strip()
+            cells.append(cell_text.replace("\r", "\n"))
+        line = "\t".join(cells).strip()
         if line:
             lines.append(line)
     return lines
@@ -99,13 +115,15 @@ def _table_to_lines(tbl: Table) -> List[str]:
 def docx_bytes_to_text(buf: io.BytesIO) -> str:
     """Extract human-visible text from DOCX (in-memory) similarly to your PPTX routine."""
     buf.seek(0)
-    doc = load_document(buf)  # use loader function
+    with zipfile.ZipFile(buf) as zf:
+        body = etree.fromstring(zf.read("word/document.xml"))
+        styles = _style_names(zf)
     out_lines: List[str] = []
 
-    for block in _iter_block_items(doc):
-        if isinstance(block, Paragraph):
-            out_lines.extend(_paragraph_to_lines(block))
-        elif isinstance(block, Table):
+    for block in _BLOCKS(body):
+        if block.tag == _w("p"):
+            out_lines.extend(_paragraph_to_lines(block, styles))
+        else:
             out_lines.extend(_table_to_lines(block))
 
     flat = [ (ln or "").strip() for ln in out_lines if (ln or "").strip() ]
@@ -119,27 +137,33 @@ _LIGATURE_MAP = {
     "•": "-", "·": "·"
 }
 
+# (char, replacement) pairs, identity entries dropped. A str.replace per pair beats str.translate
+# here: a dict translate table takes CPython's slow per-character path.
+_LIGATURE_PAIRS = tuple((k, v) for k, v in _LIGATURE_MAP.items() if k != v)
+
+_PAGENUM_RE      = re.compile(r"\n\s*\d+\s*\n")
+_HARDWRAP_RE     = re.compile(r"(?<![.!?;:])\n(?!\n|# |- )")
+_MULTINEWLINE_RE = re.compile(r"\n{3,}")
+_MULTISPACE_RE   = re.compile(r"[ \t]{2,}")
+
 def clean_for_embeddings(raw: str) -> str:
     t = raw or ""
-    for k, v in _LIGATURE_MAP.items():
+    for k, v in _LIGATURE_PAIRS:                                     # ligatures / punctuation
         t = t.replace(k, v)
-    t = t.replace("\r\n", "\n").replace("\r", "\n")
-    t = re.sub(r"\n\s*\d+\s*\n", "\n", t)                            # remove isolated page numbers
-    t = re.sub(r"(?<![.!?;:])\n(?!\n|# |- )", " ", t)                # join hard wraps
-    t = re.sub(r"\n{3,}", "\n\n", t)                                 # collapse 3+ newlines → 2
-    t = re.sub(r"[ \t]{2,}", " ", t)                                 # trim repeated spaces/tabs
+    t = t.replace("\r\n", "\n").replace("\r", "\n")                  # normalize line endings
+    t = _PAGENUM_RE.sub("\n", t)                                     # remove isolated page numbers
+    t = _HARDWRAP_RE.sub(" ", t)                                     # join hard wraps
+    t = _MULTINEWLINE_RE.sub("\n\n", t)                               # collapse 3+ newlines → 2
+    t = _MULTISPACE_RE.sub(" ", t)                                   # trim repeated spaces/tabs
     return t.strip()
 
 # ---------- Save helper (mirrors your PDF/PPTX versions) ----------
 
-def save_docx_bytes_as_txt(buf: io.BytesIO, docx_filename: str, output_dir: str = ".",
-                           include_header: bool = True) -> str:
+def docx_txt_content(buf: io.BytesIO, docx_filename: str, include_header: bool = True) -> str:
     """
-    Convert DOCX bytes to cleaned .txt for embeddings.
+    Cleaned .txt content for embeddings (what save_docx_bytes_as_txt writes).
     """
     base = os.path.splitext(os.path.basename(docx_filename))[0]
-    out_path = str(Path(output_dir) / f"{base}.txt")
-
     text = docx_bytes_to_text(buf)
     text = clean_for_embeddings(text)
 
@@ -147,6 +171,17 @@ def save_docx_bytes_as_txt(buf: io.BytesIO, docx_filename: str, output_dir: str
         today = datetime.date.today().isoformat()
         header = f"{base}\nDate: {today}\n\n"
         text = header + text
+    return text
+
+def save_docx_bytes_as_txt(buf: io.BytesIO, docx_filename: str, output_dir: str = ".",
+                           include_header: bool = True) -> str:
+    """
+    Convert DOCX bytes to cleaned .txt for embeddings.
+    """
+    base = os.path.splitext(os.path.basename(docx_filename))[0]
+    out_path = str(Path(output_dir) / f"{base}.txt")
+
+    text = docx_txt_content(buf, docx_filename, include_header)
 
     os.makedirs(output_dir, exist_ok=True)
     with open(out_path, "w", encoding="utf-8") as f:
@@ -1,15 +1,14 @@
-import io, os, re, pdfplumber 
+import io, os, re, pymupdf 
 
 def extract_with_fallback(buf: io.BytesIO, min_chars: int = 30) -> str:
     """
-    Try to extract text with pdfplumber. If a page yields less than `min_chars`,
-    fall back to OCR for that page.
+    Extract text with PyMuPDF (MuPDF, native code). If a page yields less than `min_chars`,
+    the PDF is treated as scanned/image-only and skipped (returns None).
     """
-    buf.seek(0)
     all_text = []
-    with pdfplumber.open(buf) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
+    with pymupdf.open(stream=buf.getvalue(), filetype="pdf") as pdf:
+        for page in pdf:
+            text = page.get_text("text") or ""
             if len(text.strip()) < min_chars:
                 print("THIS IS AN IMAGE, RETURNING")
                 return None
@@ -17,12 +16,16 @@ def extract_with_fallback(buf: io.BytesIO, min_chars: int = 30) -> str:
 
     return "\n\n".join(all_text)
 
+def pdf_txt_content(buf: io.BytesIO, pdf_filename: str = "") -> str:
+    """Cleaned .txt content for a PDF (what save_pdf_bytes_as_txt writes), or None for scanned PDFs."""
+    text = extract_with_fallback(buf, min_chars=30)
+    return clean_for_embeddings(text) if text is not None else None
+
 def save_pdf_bytes_as_txt(buf: io.BytesIO, pdf_filename: str, output_dir: str = ".") -> str:
     base = os.path.splitext(os.path.basename(pdf_filename))[0]
     txt_path = os.path.join(output_dir, f"{base}.txt")
-    text = extract_with_fallback(buf, min_chars=30)
+    text = pdf_txt_content(buf, pdf_filename)
     if text is not None:
-        text = clean_for_embeddings(text)
         with open(txt_path, "w", encoding="utf-8") as f:
             f.write(text)
         return txt_path
@@ -36,37 +39,50 @@ _LIGATURE_MAP = {
     "•": "-", "·": "·"  # keep middle dot if it’s meaningful
 }
 
+# (char, replacement) pairs, identity entries dropped. A str.replace per pair beats str.translate
+# here: a dict translate table takes CPython's slow per-character path.
+_LIGATURE_PAIRS = tuple((k, v) for k, v in _LIGATURE_MAP.items() if k != v)
+
+# Compiled once at import; clean_for_embeddings runs on every extracted file
+_STI_FIX_RE      = re.compile(r'(?<=sti)>ness')
+_PAGENUM_RE      = re.compile(r"\n\s*\d+\s*\n")
+_DEHYPHEN_RE     = re.compile(r"(\w)-\n(\w)")
+_HARDWRAP_RE     = re.compile(r"(?<![.!?;:])\n(?!\n)")
+_MULTINEWLINE_RE = re.compile(r"\n{3,}")
+_SPLIT_DIGITS_RE = re.compile(r"(?<=\d)\s+(?=\d)")
+_MULTISPACE_RE   = re.compile(r"[ \t]{2,}")
+
 def clean_for_embeddings(raw: str) -> str:
     t = raw
 
     # Fix common ligatures / punctuation first
-    for k, v in _LIGATURE_MAP.items():
+    for k, v in _LIGATURE_PAIRS:
         t = t.replace(k, v)
 
-    # Some broken extractions swap ligatures for odd ASCII (rare but possible).
-    # If you saw '>' where 'ff' should be, patch it here as a last resort:
-    t = re.sub(r'(?<=sti)>ness', 'ffness', t)  # optional targeted fix
-
     # Normalize newlines
     t = t.replace("\r\n", "\n").replace("\r", "\n")
 
+    # Some broken extractions swap ligatures for odd ASCII (rare but possible).
+    # If you saw '>' where 'ff' should be, patch it here as a last resort:
+    t = _STI_FIX_RE.sub('ffness', t)  # optional targeted fix
+
     # Remove page-number-only lines (tune as needed)
-    t = re.sub(r"\n\s*\d+\s*\n", "\n", t)
+    t = _PAGENUM_RE.sub("\n", t)
 
     # De-hyphenate across line breaks: 'comput-\ners' -> 'computers'
-    t = re.sub(r"(\w)-\n(\w)", r"\1\2", t)
+    t = _DEHYPHEN_RE.sub(r"\1\2", t)
 
     # Join hard wraps inside paragraphs: if no sentence punctuation, merge line
-    t = re.sub(r"(?<![.!?;:])\n(?!\n)", " ", t)
+    t = _HARDWRAP_RE.sub(" ", t)
 
     # Collapse 3+ newlines to 2 (paragraph breaks)
-    t = re.sub(r"\n{3,}", "\n\n", t)
+    t = _MULTINEWLINE_RE.sub("\n\n", t)
 
     # Fix split digits like "001 1" -> "0011"
-    t = re.sub(r"(?<=\d)\s+(?=\d)", "", t)
+    t = _SPLIT_DIGITS_RE.sub("", t)
 
     # Collapse extra spaces
-    t = re.sub(r"[ \t]{2,}", " ", t).strip()
+    t = _MULTISPACE_RE.sub(" ", t).strip()
     return t
 
 # Example: load local PDF file into memory
@@ -1,60 +1,96 @@
 # pptx_to_text.py
-# pip install python-pptx
+# pip install lxml  (optional: pygixml for a faster slide walk; python-pptx only for the PPTX_USE_PYTHON_PPTX fallback)
 
-import io, os, re, datetime
-from pptx import Presentation
+import asyncio, io, logging, os, re, datetime, posixpath, zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
 
-# ---------- Extraction ----------
+import aiofiles
+from lxml import etree
+
+try:
+    import pygixml  # pugixml (C++) parser: ~4x faster slide walk than lxml; optional (pinned in requirements)
+except ImportError:
+    pygixml = None
+
+log = logging.getLogger(__name__)
+
+# Extract with python-pptx's object model instead of reading the slide XML directly
+PPTX_USE_PYTHON_PPTX = os.getenv("PPTX_USE_PYTHON_PPTX", "").lower() in ("1", "true", "yes")
+
+# n_workers > 1: decks with at least this many slides are walked in a process pool
+# (smaller ones aren't worth the worker spawn)
+PARALLEL_MIN_SLIDES = 8
+
+# ---------- Extraction (python-pptx fallback) ----------
+@lru_cache(maxsize=None)
+def _pptx_classes():
+    """python-pptx's shape classes, imported on first use (only this path needs python-pptx)."""
+    from pptx.shapes.autoshape import Shape
+    from pptx.shapes.graphfrm import GraphicFrame
+    from pptx.shapes.group import GroupShape
+    return Shape, GraphicFrame, GroupShape
 
 def _shape_text(shape) -> list[str]:
     """Extract visible text from a single shape (including grouped shapes + tables)."""
+    # Dispatch on the proxy class (a plain isinstance check) rather than probing properties:
+    # only GroupShape has .shapes, only GraphicFrame has .has_table, and only Shape
+    # (incl. placeholders) has a text frame. shape.shape_type isn't a cheaper key: it runs
+    # placeholder/geometry XPaths, raises for unrecognized <p:sp>s, and reports a table
+    # placeholder as PLACEHOLDER.
+    Shape, GraphicFrame, GroupShape = _pptx_classes()
     lines = []
 
     # Grouped shapes
-    if hasattr(shape, "shapes"):  # group shape
+    if isinstance(shape, GroupShape):
         for shp in shape.shapes:
             lines.extend(_shape_text(shp))
         return lines
 
     # Tables
-    if getattr(shape, "has_table", False):
-        tbl = shape.table
-        for r in tbl.rows:
-            row_cells = []
-            for c in r.cells:
-                row_cells.append(c.text.replace("\r", "\n").strip())
-            # join cells with tabs (keeps structure but stays text-only)
-            lines.append("\t".join(filter(None, row_cells)))
+    if isinstance(shape, GraphicFrame):
+        if shape.has_table:
+            for r in shape.table.rows:
+                row_cells = [c.text.replace("\r", "\n").strip() for c in r.cells]
+                # join cells with tabs (keeps structure but stays text-only); skip empty rows
+                row = "\t".join(filter(None, row_cells))
+                if row:
+                    lines.append(row)
         return lines
 
     # Text frames / placeholders
-    if hasattr(shape, "has_text_frame") and shape.has_text_frame:
-        tf = shape.text_frame
-        for p in tf.paragraphs:
-            txt = "".join(run.text for run in p.runs)
-            lvl = getattr(p, "level", 0) or 0
-            txt = txt.replace("\r", "\n").strip()
-            if not txt:
-                continue
-            # basic bullet-style prefix based on indent level
-            prefix = ("- " if p.level == 0 else "  " * p.level + "- ")
-            lines.append(prefix + txt)
+    if isinstance(shape, Shape):
+        # The a:p elements straight off the shape's txBody: no TextFrame/_Paragraph wrappers
+        # (and shape.text_frame would add an empty txBody to shapes that have none)
+        txBody = shape._sp.txBody
+        if txBody is None:
+            return lines
+        for p in txBody.iterchildren(f"{{{_A}}}p"):
+            # Runs only (p.text would also pull in line breaks and field text), read from the
+            # paragraph's XML in one XPath call instead of building a _Run per run
+            txt = _paragraph_runs_text(p).replace("\r", "\n").strip()
+            if txt:
+                # basic bullet-style prefix; same at every indent level (a per-level indent
+                # used to be added here and then stripped off again with the finished lines)
+                lines.append("- " + txt)
     return lines
 
 
 def _slide_text(slide) -> list[str]:
     lines = []
-    # Title first (if any)
+    # One pass over the shapes; titles still go first, ahead of all shape text
+    # (title shapes are also listed again with the others)
     if getattr(slide, "shapes", None):
+        shape_lines = []
         for shp in slide.shapes:
-            if shp.name and "Title" in shp.name and getattr(shp, "has_text_frame", False):
+            name = shp.name
+            if name and "Title" in name and getattr(shp, "has_text_frame", False):
                 title = shp.text.strip()
                 if title:
                     lines.append(f"# {title}")
-
-        # Then all shapes
-        for shp in slide.shapes:
-            lines.extend(_shape_text(shp))
+            shape_lines.extend(_shape_text(shp))
+        lines.extend(shape_lines)
 
     # Notes (speaker notes)
     if getattr(slide, "has_notes_slide", False) and slide.notes_slide:
@@ -62,29 +98,327 @@ def _slide_text(slide) -> list[str]:
         if note:
             note_txt = "\n".join(p.text for p in note.paragraphs).strip()
             if note_txt:
-                lines.append("\n[Notes]\n" + note_txt)
+                lines.append("[Notes]\n" + note_txt)
+
+    # Every line above is already stripped and non-empty
+    return lines
+
+
+def _pptx_slide_bodies(buf: io.BytesIO) -> Iterator[List[str]]:
+    from pptx import Presentation
+    for s in Presentation(buf).slides:
+        yield _slide_text(s)
+
+
+# ---------- Extraction (slide XML read straight from the zip with lxml) ----------
+# Same output as the python-pptx walk above, without building Shape/TextFrame/_Run wrappers:
+# each slide part is parsed once and walked as plain lxml elements.
+
+_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_RT_OFFICE_DOC = f"{_R}/officeDocument"
+_RT_NOTES = f"{_R}/notesSlide"
+_TABLE_URI = "http://schemas.openxmlformats.org/drawingml/2006/table"
+NS = {"a": _A, "p": _P, "r": _R}
+
+# Children of p:spTree / p:grpSp that python-pptx treats as shapes
+_SHAPE_TAGS = {f"{{{_P}}}{t}" for t in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "contentPart")}
+_SP, _GRPSP, _GRAPHIC_FRAME = f"{{{_P}}}sp", f"{{{_P}}}grpSp", f"{{{_P}}}graphicFrame"
+_A_R, _A_BR, _A_FLD, _A_T = f"{{{_A}}}r", f"{{{_A}}}br", f"{{{_A}}}fld", f"{{{_A}}}t"
+
+_SHAPE_NAME = etree.XPath("string(./*[1]/p:cNvPr/@name)", namespaces=NS)
+_PH_TYPE    = etree.XPath("./*[1]/p:nvPr/p:ph/@type", namespaces=NS)
+_TABLE_ROWS = etree.XPath("./a:graphic/a:graphicData[@uri=$uri]/a:tbl/a:tr", namespaces=NS)
+# Text of a paragraph's a:r runs in one call (no per-run Python loop); plain str results
+_RUN_TEXTS = etree.XPath("a:r/a:t/text()", namespaces=NS, smart_strings=False)
+
+def _run_text(r) -> str:
+    t = r.find(_A_T)
+    return (t.text or "") if t is not None else ""
+
+def _paragraph_runs_text(p) -> str:
+    """python-pptx's "".join(run.text for run in p.runs): a:r only."""
+    return "".join(_RUN_TEXTS(p))
+
+def _paragraph_text(p) -> str:
+    """python-pptx's _Paragraph.text: runs and fields, "\v" per line break."""
+    return "".join("\v" if c.tag == _A_BR else _run_text(c) for c in p.iterchildren(_A_R, _A_BR, _A_FLD))
+
+def _text_frame_text(txBody) -> str:
+    return "\n".join(_paragraph_text(p) for p in txBody.iterchildren(f"{{{_A}}}p")) if txBody is not None else ""
+
+def _xml_shape_text(el) -> List[str]:
+    """Same lines as _shape_text, from the shape's element."""
+    lines = []
+    if el.tag == _GRPSP:
+        for child in el.iterchildren(*_SHAPE_TAGS):
+            lines.extend(_xml_shape_text(child))
+        return lines
+
+    if el.tag == _GRAPHIC_FRAME:
+        for tr in _TABLE_ROWS(el, uri=_TABLE_URI):
+            row_cells = [_text_frame_text(tc.find("a:txBody", NS)).replace("\r", "\n").strip()
+                         for tc in tr.iterchildren(f"{{{_A}}}tc")]
+            row = "\t".join(filter(None, row_cells))
+            if row:
+                lines.append(row)
+        return lines
+
+    if el.tag == _SP:
+        txBody = el.find("p:txBody", NS)
+        if txBody is None:
+            return lines
+        for p in txBody.iterchildren(f"{{{_A}}}p"):
+            txt = _paragraph_runs_text(p).replace("\r", "\n").strip()
+            if txt:
+                lines.append("- " + txt)
+    return lines
+
+def _xml_slide_text(slide, notes) -> List[str]:
+    """Same lines as _slide_text, from the parsed slide (and notes slide) parts."""
+    lines = []
+    shapes = [el for el in slide.find("p:cSld/p:spTree", NS).iterchildren(*_SHAPE_TAGS)]
+    # Title first (if any)
+    for el in shapes:
+        if el.tag == _SP and "Title" in _SHAPE_NAME(el):
+            title = _text_frame_text(el.find("p:txBody", NS)).strip()
+            if title:
+                lines.append(f"# {title}")
+    # Then all shapes
+    for el in shapes:
+        lines.extend(_xml_shape_text(el))
+
+    # Notes (speaker notes): the notes slide's body placeholder
+    if notes is not None:
+        for el in notes.find("p:cSld/p:spTree", NS).iterchildren(*_SHAPE_TAGS):
+            if _PH_TYPE(el) == ["body"]:
+                if el.tag == _SP:
+                    note_txt = _text_frame_text(el.find("p:txBody", NS)).strip()
+                    if note_txt:
+                        lines.append("[Notes]\n" + note_txt)
+                break
+    return lines
+
+# ---------- Extraction (pygixml fast path, used when it's installed) ----------
+# pugixml isn't namespace-aware: nodes are matched by their qualified names ("p:sp", "a:t"),
+# so a part is only read this way when its root binds a:/p: to the usual namespaces
+# (PowerPoint always does); anything else goes through the lxml walk above.
+
+# A pygixml release whose API doesn't match the pinned one is detected once, at import
+# (_pugi_probe below), and leaves the extractor on lxml instead of breaking it
+if pygixml is not None:
+    try:
+        # Entities and line endings decoded like lxml; keep whitespace-only text (<a:t> </a:t>)
+        _PUGI_FLAGS = (pygixml.ParseFlags.CDATA | pygixml.ParseFlags.ESCAPES | pygixml.ParseFlags.EOL
+                       | pygixml.ParseFlags.WCONV_ATTRIBUTE | pygixml.ParseFlags.WS_PCDATA_SINGLE)
+    except AttributeError as e:
+        log.warning("pygixml %s isn't supported, using lxml: %s", getattr(pygixml, "__version__", "?"), e)
+        pygixml = None
+_PUGI_SHAPES = {"p:sp", "p:grpSp", "p:graphicFrame", "p:cxnSp", "p:pic", "p:contentPart"}
+
+def _pugi_parse(xml: bytes):
+    """Parsed slide part, or None if it can't be read by prefix. Nodes are only valid while
+    the returned document is referenced, so callers keep it around, not just its .root."""
+    try:
+        doc = pygixml.parse_string(xml.decode("utf-8"), _PUGI_FLAGS)
+    except (UnicodeDecodeError, pygixml.PygiXMLError):
+        return None
+    root = doc.root
+    if root.attribute("xmlns:a").value != _A or root.attribute("xmlns:p").value != _P:
+        return None
+    return doc
+
+def _pugi_run_text(r) -> str:
+    t = r.child("a:t")
+    return t.text(recursive=False, join="") if t else ""
+
+def _pugi_text_frame_text(txBody) -> str:
+    if not txBody:
+        return ""
+    paras = []
+    for p in txBody.children():
+        if p.name == "a:p":
+            paras.append("".join(
+                "\v" if c.name == "a:br" else _pugi_run_text(c)
+                for c in p.children() if c.name in ("a:r", "a:br", "a:fld")
+            ))
+    return "\n".join(paras)
+
+def _pugi_shape_text(el) -> List[str]:
+    """_xml_shape_text on a pygixml node."""
+    lines = []
+    tag = el.name
+    if tag == "p:grpSp":
+        for child in el.children():
+            if child.name in _PUGI_SHAPES:
+                lines.extend(_pugi_shape_text(child))
+        return lines
 
-    # Filter duplicated empties and strip
-    flat = []
-    for ln in lines:
-        ln = (ln or "").strip()
-        if ln:
-            flat.append(ln)
-    return flat
+    if tag == "p:graphicFrame":
+        data = el.child("a:graphic").child("a:graphicData")
+        if data and data.attribute("uri").value == _TABLE_URI:
+            for tr in data.child("a:tbl").children():
+                if tr.name == "a:tr":
+                    row_cells = [_pugi_text_frame_text(tc.child("a:txBody")).replace("\r", "\n").strip()
+                                 for tc in tr.children() if tc.name == "a:tc"]
+                    row = "\t".join(filter(None, row_cells))
+                    if row:
+                        lines.append(row)
+        return lines
 
+    if tag == "p:sp":
+        txBody = el.child("p:txBody")
+        if not txBody:
+            return lines
+        for p in txBody.children():
+            if p.name != "a:p":
+                continue
+            txt = "".join(_pugi_run_text(r) for r in p.children() if r.name == "a:r").replace("\r", "\n").strip()
+            if txt:
+                lines.append("- " + txt)
+    return lines
+
+def _pugi_slide_text(slide_xml: bytes, notes_xml: Optional[bytes]) -> Optional[List[str]]:
+    """_xml_slide_text via pygixml; None when a part has to go through lxml instead."""
+    slide_doc = _pugi_parse(slide_xml)
+    notes_doc = _pugi_parse(notes_xml) if notes_xml is not None else None
+    if slide_doc is None or (notes_xml is not None and notes_doc is None):
+        return None
+    lines = []
+    shapes = [el for el in slide_doc.root.child("p:cSld").child("p:spTree").children() if el.name in _PUGI_SHAPES]
+    # Title first (if any)
+    for el in shapes:
+        if el.name == "p:sp" and "Title" in el.child("p:nvSpPr").child("p:cNvPr").attribute("name").value:
+            title = _pugi_text_frame_text(el.child("p:txBody")).strip()
+            if title:
+                lines.append(f"# {title}")
+    # Then all shapes
+    for el in shapes:
+        lines.extend(_pugi_shape_text(el))
+
+    # Notes (speaker notes): the notes slide's body placeholder
+    if notes_doc is not None:
+        for el in notes_doc.root.child("p:cSld").child("p:spTree").children():
+            if el.name not in _PUGI_SHAPES:
+                continue
+            if el.first_child().child("p:nvPr").child("p:ph").attribute("type").value == "body":
+                if el.name == "p:sp":
+                    note_txt = _pugi_text_frame_text(el.child("p:txBody")).strip()
+                    if note_txt:
+                        lines.append("[Notes]\n" + note_txt)
+                break
+    return lines
 
-def pptx_bytes_to_text(buf: io.BytesIO) -> str:
-    """Extract text from PPTX (in-memory) with python-pptx."""
+# Probe parts touching every node/attribute call the pygixml walk makes: title, runs and a
+# line break, whitespace-only text, an entity, a nested group, a table and a notes placeholder
+_PROBE_SP = ('<p:sp><p:nvSpPr><p:cNvPr id="{id}" name="{name}"/><p:cNvSpPr/><p:nvPr>{ph}</p:nvPr></p:nvSpPr>'
+             '<p:txBody><a:bodyPr/>{paras}</p:txBody></p:sp>')
+_PROBE_SLIDE = (
+    f'<p:sld xmlns:a="{_A}" xmlns:p="{_P}"><p:cSld><p:spTree><p:nvGrpSpPr/>'
+    + _PROBE_SP.format(id=2, name="Title 1", ph='<p:ph type="title"/>', paras='<a:p><a:r><a:t>Q &amp; A</a:t></a:r></a:p>')
+    + _PROBE_SP.format(id=3, name="Body", ph="", paras='<a:p><a:r><a:t>one</a:t></a:r><a:br/><a:r><a:t> two\r</a:t></a:r></a:p><a:p><a:r><a:t> </a:t></a:r></a:p>')
+    + '<p:grpSp><p:nvGrpSpPr><p:cNvPr id="4" name="G"/></p:nvGrpSpPr><p:grpSp><p:nvGrpSpPr><p:cNvPr id="5" name="G2"/></p:nvGrpSpPr>'
+    + _PROBE_SP.format(id=6, name="Inner", ph="", paras='<a:p><a:r><a:t>grouped</a:t></a:r></a:p>')
+    + '</p:grpSp></p:grpSp>'
+    + f'<p:graphicFrame><p:nvGraphicFramePr><p:cNvPr id="7" name="Table"/></p:nvGraphicFramePr><a:graphic><a:graphicData uri="{_TABLE_URI}">'
+    + '<a:tbl><a:tr><a:tc><a:txBody><a:p><a:r><a:t>c1</a:t></a:r></a:p></a:txBody></a:tc><a:tc><a:txBody><a:p/></a:txBody></a:tc>'
+    + '<a:tc><a:txBody><a:p><a:r><a:t>c3</a:t></a:r></a:p></a:txBody></a:tc></a:tr></a:tbl></a:graphicData></a:graphic></p:graphicFrame>'
+    + '</p:spTree></p:cSld></p:sld>'
+).encode()
+_PROBE_NOTES = (
+    f'<p:notes xmlns:a="{_A}" xmlns:p="{_P}"><p:cSld><p:spTree><p:nvGrpSpPr/>'
+    + _PROBE_SP.format(id=2, name="Notes", ph='<p:ph type="body" idx="1"/>', paras='<a:p><a:r><a:t>note</a:t></a:r></a:p>')
+    + '</p:spTree></p:cSld></p:notes>'
+).encode()
+
+def _pugi_probe() -> bool:
+    """Whether the installed pygixml walks the probe parts exactly like the lxml walker."""
+    want = _xml_slide_text(etree.fromstring(_PROBE_SLIDE), etree.fromstring(_PROBE_NOTES))
+    try:
+        got = _pugi_slide_text(_PROBE_SLIDE, _PROBE_NOTES)
+    except Exception as e:
+        got = e
+    if got != want:
+        log.warning("pygixml %s isn't supported, using lxml: probe gave %r", getattr(pygixml, "__version__", "?"), got)
+        return False
+    return True
+
+USE_PYGIXML = pygixml is not None and _pugi_probe()
+
+
+def _rels(zf: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """rId -> (relationship type, target part name) for a package part."""
+    rels_name = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    try:
+        root = etree.fromstring(zf.read(rels_name))
+    except KeyError:
+        return {}
+    out = {}
+    for rel in root.iterchildren(f"{{{_PKG_REL}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target")
+        target = target[1:] if target.startswith("/") else posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+        out[rel.get("Id")] = (rel.get("Type"), target)
+    return out
+
+def _xml_slide_parts(zf: zipfile.ZipFile) -> Iterator[Tuple[bytes, Optional[bytes]]]:
+    """(slide XML, notes XML or None) for each slide, in presentation order (p:sldIdLst), not by part name."""
+    main = next(target for rtype, target in _rels(zf, "").values() if rtype == _RT_OFFICE_DOC)
+    prs, prs_rels = etree.fromstring(zf.read(main)), _rels(zf, main)
+    for sld_id in prs.iterfind("p:sldIdLst/p:sldId", NS):
+        slide_part = prs_rels[sld_id.get(f"{{{_R}}}id")][1]
+        notes_part = next((t for rtype, t in _rels(zf, slide_part).values() if rtype == _RT_NOTES), None)
+        yield zf.read(slide_part), zf.read(notes_part) if notes_part else None
+
+def _extract_slide(slide_xml: bytes, notes_xml: Optional[bytes]) -> List[str]:
+    # Works on raw part bytes only, so it can also run in a worker process
+    body = None
+    if USE_PYGIXML:
+        try:
+            body = _pugi_slide_text(slide_xml, notes_xml)
+        except Exception as e:
+            # This slide only: the API itself was checked at import
+            log.warning("pygixml walk failed, reading this slide with lxml: %s", e)
+    if body is None:
+        body = _xml_slide_text(etree.fromstring(slide_xml),
+                               etree.fromstring(notes_xml) if notes_xml is not None else None)
+    return body
+
+def _xml_slide_bodies(buf: io.BytesIO, n_workers: int = 1) -> Iterator[List[str]]:
+    with zipfile.ZipFile(buf) as zf:
+        parts = _xml_slide_parts(zf)
+        if n_workers > 1:
+            parts = list(parts)
+            if len(parts) >= PARALLEL_MIN_SLIDES:
+                with ProcessPoolExecutor(max_workers=n_workers) as ex:
+                    # map keeps slide order; chunks so each task carries a few slides, not one
+                    yield from ex.map(_extract_slide, *zip(*parts), chunksize=max(1, len(parts) // (4 * n_workers)))
+                return
+        # Serially, one slide at a time: only the current slide's parts and lines are held
+        for slide_xml, notes_xml in parts:
+            yield _extract_slide(slide_xml, notes_xml)
+
+
+def iter_slide_texts(buf: io.BytesIO, n_workers: int = 1) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily yield (slide number, "--- Slide N ---" block) for each slide, so a big deck can be
+    consumed slide by slide. n_workers > 1 walks the slides of a big deck in that many processes;
+    leave it at 1 when already running inside a pool (the scraper parallelizes across files instead).
+    """
     buf.seek(0)
-    prs = Presentation(buf)
-    slides_out = []
-    for idx, s in enumerate(prs.slides, start=1):
-        body = _slide_text(s)
-        if body:
-            slides_out.append(f"\n--- Slide {idx} ---\n" + "\n".join(body))
-        else:
-            slides_out.append(f"\n--- Slide {idx} ---\n")
-    return "\n".join(slides_out).strip()
+    bodies = _pptx_slide_bodies(buf) if PPTX_USE_PYTHON_PPTX else _xml_slide_bodies(buf, n_workers)
+    for idx, body in enumerate(bodies, start=1):
+        yield idx, f"--- Slide {idx} ---\n" + "\n".join(body)
+
+
+def pptx_bytes_to_text(buf: io.BytesIO, n_workers: int = 1) -> str:
+    """Extract text from PPTX (in-memory)."""
+    # Blank line between slides; one join, no per-slide "\n" + text copies, and only an
+    # rstrip (the text starts with "--- Slide 1", so there's nothing to strip in front)
+    return "\n\n".join(text for _, text in iter_slide_texts(buf, n_workers)).rstrip()
 
 
 # ---------- Cleaning (reuse your style) ----------
@@ -95,53 +429,92 @@ _LIGATURE_MAP = {
     "•": "-", "·": "·"
 }
 
+# (char, replacement) pairs, identity entries dropped. A str.replace per pair beats str.translate
+# here: a dict translate table takes CPython's slow per-character path, ~7x slower on a 1MB deck.
+_LIGATURE_PAIRS = tuple((k, v) for k, v in _LIGATURE_MAP.items() if k != v)
+
+# Compiled once at import; clean_for_embeddings runs on every extracted deck.
+# Each pattern starts with a literal char (or a small set), so the regex engine's prefix search
+# jumps between candidates instead of trying a match at every position: the hard-wrap pattern checks
+# the char before the "\n" with a lookbehind *after* it (same matches as (?<![.!?;:])\n),
+# and \n\n\n+ / [ \t][ \t]+ are \n{3,} / [ \t]{2,} spelled out.
+_SLIDENUM_RE     = re.compile(r"\n\s*\d+\s*\n")
+_HARDWRAP_RE     = re.compile(r"\n(?<![.!?;:]\n)(?!\n|- )")  # don’t join lines that look like list items
+_MULTINEWLINE_RE = re.compile(r"\n\n\n+")
+_MULTISPACE_RE   = re.compile(r"[ \t][ \t]+")
+_MULTIBLANK_RE   = re.compile(r"  +")  # same matches as _MULTISPACE_RE when there's no tab: ~4x faster (literal prefix)
+
 def clean_for_embeddings(raw: str) -> str:
     t = raw or ""
 
     # Fix common ligatures / punctuation first
-    for k, v in _LIGATURE_MAP.items():
+    for k, v in _LIGATURE_PAIRS:
         t = t.replace(k, v)
 
-    # Normalize line endings
-    t = t.replace("\r\n", "\n").replace("\r", "\n")
-
-    # Remove isolated slide numbers like lines that are just digits
-    t = re.sub(r"\n\s*\d+\s*\n", "\n", t)
-
-    # Join obvious hard wraps within paragraphs (keep blank lines as paragraph breaks)
-    t = re.sub(r"(?<![.!?;:])\n(?!\n|- )", " ", t)  # don’t join lines that look like list items
-
-    # Collapse 3+ newlines → 2
-    t = re.sub(r"\n{3,}", "\n\n", t)
-
-    # Trim repeated spaces
-    t = re.sub(r"[ \t]{2,}", " ", t)
+    # Normalize line endings (the "\r" check is a memchr; most decks have none)
+    if "\r" in t:
+        t = t.replace("\r\n", "\n").replace("\r", "\n")
 
+    t = _SLIDENUM_RE.sub("\n", t)                                   # remove isolated slide numbers
+    t = _HARDWRAP_RE.sub(" ", t)                                     # join hard wraps within paragraphs
+    t = _MULTINEWLINE_RE.sub("\n\n", t)                              # collapse 3+ newlines → 2
+    t = (_MULTISPACE_RE if "\t" in t else _MULTIBLANK_RE).sub(" ", t)  # trim repeated spaces (tabs only come from tables)
     return t.strip()
 
 
 # ---------- Save helper (mirrors your PDF version) ----------
 
-def save_pptx_bytes_as_txt(buf: io.BytesIO, pptx_filename: str, output_dir: str = ".",
-                           include_header: bool = True) -> str:
+def pptx_txt_content(buf: io.BytesIO, pptx_filename: str, include_header: bool = True,
+                     n_workers: int = 1) -> str:
     """
-    Convert PPTX bytes to cleaned .txt for embeddings.
+    Cleaned .txt content for embeddings (what save_pptx_bytes_as_txt writes).
     """
     base = os.path.splitext(os.path.basename(pptx_filename))[0]
-    txt_path = os.path.join(output_dir, f"{base}.txt")
-
-    text = pptx_bytes_to_text(buf)
+    text = pptx_bytes_to_text(buf, n_workers)
     text = clean_for_embeddings(text)
 
     if include_header:
         today = datetime.date.today().isoformat()
         header = f"{base}\nDate: {today}\n\n"
         text = header + text
+    return text
+
+def save_pptx_bytes_as_txt(buf: io.BytesIO, pptx_filename: str, output_dir: str = ".",
+                           include_header: bool = True, n_workers: int = 1) -> str:
+    """
+    Convert PPTX bytes to cleaned .txt for embeddings.
+    """
+    base = os.path.splitext(os.path.basename(pptx_filename))[0]
+    txt_path = os.path.join(output_dir, f"{base}.txt")
+
+    text = pptx_txt_content(buf, pptx_filename, include_header, n_workers)
 
     with open(txt_path, "w", encoding="utf-8") as f:
         f.write(text)
     return txt_path
 
+async def _write_txt(txt_path: str, text: str) -> None:
+    async with aiofiles.open(txt_path, "w", encoding="utf-8") as f:
+        await f.write(text)
+
+async def save_many_pptx_bytes_as_txt(items: List[Tuple[io.BytesIO, str]], output_dir: str = ".",
+                                      include_header: bool = True, n_workers: int = 1) -> List[str]:
+    """
+    save_pptx_bytes_as_txt for a batch of (buf, pptx_filename) decks, e.g. a whole course.
+    Extraction runs in a worker thread so it doesn't block the event loop, and each .txt
+    write is started as soon as its deck is extracted, so the writes overlap with
+    extracting the next deck. Returns the paths in order.
+    """
+    txt_paths, writes = [], []
+    for buf, pptx_filename in items:
+        base = os.path.splitext(os.path.basename(pptx_filename))[0]
+        txt_path = os.path.join(output_dir, f"{base}.txt")
+        text = await asyncio.to_thread(pptx_txt_content, buf, pptx_filename, include_header, n_workers)
+        writes.append(asyncio.create_task(_write_txt(txt_path, text)))
+        txt_paths.append(txt_path)
+    await asyncio.gather(*writes)
+    return txt_paths
+
 
 # ---------- Example usage ----------
 
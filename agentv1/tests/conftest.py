@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import modules the way the app does (run from agentv1/)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
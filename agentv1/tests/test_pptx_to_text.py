@@ -0,0 +1,118 @@
+# The pygixml walker must give exactly the lxml walker's lines (and so the same .txt).
+import io
+import zipfile
+
+import pytest
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Inches
+
+from scraper import pptx_to_text as m
+
+needs_pygixml = pytest.mark.skipif(m.pygixml is None, reason="pygixml not installed")
+
+
+def make_deck() -> bytes:
+    prs = Presentation()
+    for i in range(6):
+        s = prs.slides.add_slide(prs.slide_layouts[6 if i == 5 else 1])
+        if i != 5:
+            s.shapes.title.text = f"Title {i} & <more>"
+            tf = s.placeholders[1].text_frame
+            tf.text = f"first bullet {i}"
+            for lvl in (1, 2, 0):
+                p = tf.add_paragraph()
+                p.text, p.level = f"level {lvl}", lvl
+            p = tf.add_paragraph()
+            p.add_run().text = "before break"
+            p.add_line_break()
+            p.add_run().text = "after"
+            tf.add_paragraph()  # empty
+            tf.add_paragraph().add_run().text = "   "  # whitespace only
+        if i in (1, 4):
+            t = s.shapes.add_table(3, 3, Inches(1), Inches(4), Inches(4), Inches(1)).table
+            for a in range(3):
+                for b in range(3):
+                    t.cell(a, b).text = "" if (a + b) % 4 == 0 else f"c{a}{b}\nline2"
+        if i in (2, 5):
+            g = s.shapes.add_group_shape()
+            g.shapes.add_textbox(Inches(1), Inches(1), Inches(2), Inches(1)).text_frame.text = "grouped"
+            inner = g.shapes.add_group_shape().shapes.add_textbox(0, 0, 10, 10)
+            inner.text_frame.text = "nested\rgroup"
+            inner.name = "Subtitle Title-ish"
+        if i in (0, 3, 5):
+            s.notes_slide.notes_text_frame.text = f"speaker note {i}\nsecond para"
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def deck() -> bytes:
+    return make_deck()
+
+
+def slide_parts(deck: bytes):
+    with zipfile.ZipFile(io.BytesIO(deck)) as zf:
+        return list(m._xml_slide_parts(zf))
+
+
+@needs_pygixml
+def test_probe_passes():
+    assert m._pugi_probe()
+
+
+@needs_pygixml
+def test_pygixml_walker_matches_lxml_per_slide(deck):
+    for slide_xml, notes_xml in slide_parts(deck):
+        want = m._xml_slide_text(etree.fromstring(slide_xml),
+                                 etree.fromstring(notes_xml) if notes_xml is not None else None)
+        assert m._pugi_slide_text(slide_xml, notes_xml) == want
+
+
+@needs_pygixml
+def test_pygixml_and_lxml_give_the_same_text(deck, monkeypatch):
+    monkeypatch.setattr(m, "USE_PYGIXML", True)
+    fast = m.pptx_bytes_to_text(io.BytesIO(deck))
+    monkeypatch.setattr(m, "USE_PYGIXML", False)
+    assert m.pptx_bytes_to_text(io.BytesIO(deck)) == fast
+    assert "# Title 0 & <more>" in fast and "[Notes]\nspeaker note 0\nsecond para" in fast
+
+
+@needs_pygixml
+def test_unusual_prefixes_go_through_lxml():
+    slide_xml = m._PROBE_SLIDE.replace(b"xmlns:a=", b"xmlns:x=").replace(b"<a:", b"<x:").replace(b"</a:", b"</x:")
+    assert m._pugi_slide_text(slide_xml, None) is None
+    assert m._extract_slide(slide_xml, None) == m._xml_slide_text(etree.fromstring(slide_xml), None)
+
+
+def test_failed_slide_falls_back_to_lxml_for_that_slide_only(deck, monkeypatch):
+    want = m.pptx_bytes_to_text(io.BytesIO(deck))
+
+    def broken(slide_xml, notes_xml):
+        raise RuntimeError("bad slide")
+
+    monkeypatch.setattr(m, "USE_PYGIXML", True)
+    monkeypatch.setattr(m, "_pugi_slide_text", broken)
+    assert m.pptx_bytes_to_text(io.BytesIO(deck)) == want
+    assert m.USE_PYGIXML
+
+
+def test_save_many_writes_each_deck_off_the_event_loop(deck, tmp_path, monkeypatch):
+    import asyncio
+    import threading
+
+    loop_thread, extract_threads = threading.get_ident(), []
+    real = m.pptx_txt_content
+
+    def spy(*args):
+        extract_threads.append(threading.get_ident())
+        return real(*args)
+
+    monkeypatch.setattr(m, "pptx_txt_content", spy)
+    paths = asyncio.run(m.save_many_pptx_bytes_as_txt(
+        [(io.BytesIO(deck), "a.pptx"), (io.BytesIO(deck), "dir/b.pptx")], str(tmp_path)))
+    assert paths == [str(tmp_path / "a.txt"), str(tmp_path / "b.txt")]
+    assert loop_thread not in extract_threads
+    want = real(io.BytesIO(deck), "b.pptx", True, 1)
+    assert (tmp_path / "b.txt").read_text(encoding="utf-8") == want
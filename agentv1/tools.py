@@ -1,25 +1,49 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-from rag_utils import hybrid_search
+from rag_utils import hybrid_search, hybrid_search_batch
 
-from datetime import datetime
+import atexit
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from functools import lru_cache
 
 from pathlib import Path
+from typing import List
 
 from backend_google.google_drive2 import send_to_google_drive
 
 LOG_FILE = Path("answers.log")
 
-class_selected = [""]
+# answers.log stays open for the life of the process (opened on the first answer)
+_log_fh = None
+_log_lock = threading.Lock()
+
+def _append_log(text: str) -> None:
+    global _log_fh
+    with _log_lock:
+        if _log_fh is None:
+            _log_fh = LOG_FILE.open("a", encoding="utf-8")
+            atexit.register(_log_fh.close)
+        _log_fh.write(text)
+        _log_fh.flush()
+
+# Selected class(es) for the current request: context-local like the Drive token, so concurrent
+# requests don't search each other's courses (tool calls run with a copy of the caller's context)
+class_selected: ContextVar = ContextVar("class_selected", default="")
 #make a ceng351 notesheet on memory adders
 def change_selected_class_tools(new_class):
-    class_selected[0] = new_class
-    print(class_selected[0])
+    class_selected.set(new_class)
+    print(new_class)
 
 class QueryInput(BaseModel): 
     prompt: str = Field(description="The query from the user")
 
+class QueryBatchInput(BaseModel):
+    prompts: List[str] = Field(description="Several queries to search for at once")
+
 class AIResponseInput(BaseModel):
     ai_response: str = Field(description="The response from the AI to answer the users question.")
 
@@ -30,17 +54,30 @@ class NoteSheetInput(BaseModel):
 class LecturePathInformation(BaseModel):
     lecture_path: str = Field(description="The lecture Path to get the entire lecture notes.")
 
+class LectureRangeInput(BaseModel):
+    lecture_path: str = Field(description="The lecture Path to read from.")
+    start: int = Field(description="Character offset to start reading at (0 is the beginning of the lecture).")
+    end: int = Field(description="Character offset to stop reading at (exclusive).")
+
 
 @tool("get_information_from_database", args_schema=QueryInput, return_direct=False)
 def get_information_from_database(prompt: str):
     """Accesses student data and returns important information. This calls the database to give the AI relevant information"""
     try:
         # response = llm.invoke(prompt)
-        important_information = hybrid_search(prompt, class_selected, k_final=5, w_emb=0.7, w_bm25=0.3)
+        important_information = hybrid_search(prompt, [class_selected.get()], k_final=5, w_emb=0.7, w_bm25=0.3)
         return important_information
     except Exception as e:
         return {"error": str(e)}
 
+@tool("get_information_from_database_batch", args_schema=QueryBatchInput, return_direct=False)
+def get_information_from_database_batch(prompts: List[str]):
+    """Same as get_information_from_database for several queries at once (one embedding request for all of them). Returns one result list per query, in order."""
+    try:
+        return hybrid_search_batch(prompts, [class_selected.get()], k_final=5, w_emb=0.7, w_bm25=0.3)
+    except Exception as e:
+        return {"error": str(e)}
+
 @tool("create_note_sheet", args_schema=NoteSheetInput, return_direct=True)
 def create_note_sheet(content: str, title: str):
     """Sends AI response to a google doc to create a note sheet. The AI needs to have already generated the note sheet content. This is just to create the google doc."""
@@ -55,31 +92,57 @@ def answer_question(ai_response: str):
     Answers the user question by sending the AI response to the user. 
     """
     try:
-        with LOG_FILE.open("a", encoding="utf-8") as f:
-            f.write(ai_response + "\n\n")  # double newline for readability
+        _append_log(ai_response + "\n\n")  # double newline for readability
         return {"success": True, "saved_to": str(LOG_FILE)}
     except Exception as e:
         return {"error": str(e)}
 
+# The agent often asks for the same lecture several times in a conversation; mtime_ns is part
+# of the key so a re-scraped file is read again
+@lru_cache(maxsize=32)
+def _load_lecture(path: str, mtime_ns: int) -> str:
+    return Path(path).read_text(encoding="utf-8")
+
+def _lecture_text(lecture_path: str) -> str:
+    p = Path(lecture_path)
+    return _load_lecture(str(p), p.stat().st_mtime_ns)
+
 @tool("get_entire_lecture_notes", args_schema=LecturePathInformation, return_direct=False)
 def get_entire_lecture_notes(lecture_path: str):
     """Gets the entire lecture notes for a specific lecture from a .txt file."""
     try:
-        with open(lecture_path, "r", encoding="utf-8") as f:
-            content = f.read()
         # Return as a plain string so LLM can process the full lecture notes
-        return content
+        return _lecture_text(lecture_path)
     except FileNotFoundError:
         return {"error": f"Lecture file not found at path: {lecture_path}"}
     except Exception as e:
         return {"error": str(e)}
 
+@tool("get_lecture_notes_range", args_schema=LectureRangeInput, return_direct=False)
+def get_lecture_notes_range(lecture_path: str, start: int, end: int):
+    """Gets part of the lecture notes of a .txt file: the characters from start to end. Returns the text and the lecture's total length."""
+    try:
+        text = _lecture_text(lecture_path)
+        return {"text": text[max(start, 0):max(end, 0)], "total_chars": len(text)}
+    except FileNotFoundError:
+        return {"error": f"Lecture file not found at path: {lecture_path}"}
+    except Exception as e:
+        return {"error": str(e)}
+
+# Today's date string, reused until the next local midnight
+_DATE_CACHE = {"until": 0.0, "val": None}
+
 @tool("get_current_date", return_direct=False)
 def get_current_date(_=None):
     """Gets the current date in YYYY-MM-DD format."""
     try:
-        today = datetime.now().strftime("%Y-%m-%d")
-        return today
+        now = time.time()
+        if now >= _DATE_CACHE["until"]:
+            today = datetime.fromtimestamp(now)
+            midnight = (today + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            _DATE_CACHE["val"] = today.strftime("%Y-%m-%d")
+            _DATE_CACHE["until"] = midnight.timestamp()
+        return _DATE_CACHE["val"]
     except Exception as e:
         return {"error": str(e)}
 
@@ -88,4 +151,4 @@ def get_current_date(_=None):
 
 
 
-tools = [get_information_from_database, create_note_sheet, answer_question, get_entire_lecture_notes, get_current_date]
+tools = [get_information_from_database, get_information_from_database_batch, create_note_sheet, answer_question, get_entire_lecture_notes, get_lecture_notes_range, get_current_date]